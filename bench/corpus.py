@@ -0,0 +1,156 @@
+"""
+    Synthetic ooc SDK corpus for benchmarks.
+
+    Writes a Sphinx project with *modules* pages in the layout of
+    ``source/sdk`` (see ``source/sdk/structs/HashMap.rst``): every module has
+    a few functions and *classes* classes or covers, each with a static
+    ``new``, an ``init`` and *members* further methods and fields whose
+    signatures use deeply nested generics and dense ``:class:``/``:cover:``
+    references into other modules.
+
+    Usage: python bench/corpus.py OUTDIR [modules] [classes] [members]
+"""
+import os
+import random
+import sys
+
+CONF = '''\
+import sys, os
+sys.path.insert(0, %(root)r)
+extensions = ['sphinx_ooc']
+primary_domain = 'ooc'
+master_doc = 'index'
+project = u'ooc-bench'
+'''
+
+BASE_COVERS = ['Int', 'UInt', 'Bool', 'Char', 'SizeT', 'Float', 'Pointer']
+PACKAGES = ['io', 'lang', 'net', 'os', 'structs', 'text', 'threading']
+
+def _generic(rng, depth, classes):
+    """
+        A generic type expression nested *depth* levels deep, like
+        ``HashMap<K, List<Pair<A,B>>>``.
+    """
+    if depth <= 0:
+        return rng.choice(['T', 'K', 'V'])
+    name = rng.choice(classes)[1]
+    return '%s<K, %s>' % (name, _generic(rng, depth - 1, classes))
+
+def _typeref(rng, classes, covers, depth=0):
+    if not depth and rng.random() < 0.5:
+        return ':cover:`~lang/types %s` ' % rng.choice(covers)
+    module, name, generics = rng.choice(classes)
+    if depth:
+        generics = '<K, %s>' % _generic(rng, depth - 1, classes)
+    return ':%s:`~%s %s%s` ' % (generics and 'class' or 'cover', module,
+                                name, generics)
+
+def _params(rng, count, classes, covers, depth):
+    params = []
+    for i in range(count):
+        if depth and i == 0:
+            params.append('arg%d: %s' % (i, _typeref(rng, classes, covers,
+                                                     depth)))
+        else:
+            params.append('arg%d: %s' % (i, _typeref(rng, classes, covers)))
+    return ', '.join(params)
+
+def generate_corpus(outdir, modules=100, classes=5, members=10, depth=4,
+                    seed=0):
+    """
+        Write the corpus to *outdir* and return the number of documented
+        symbols.
+    """
+    rng = random.Random(seed)
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    modnames = ['%s/Module%d' % (PACKAGES[i % len(PACKAGES)], i)
+                for i in range(modules)]
+    declared = []
+    for modname in modnames:
+        for c in range(classes):
+            name = '%sClass%d' % (modname.split('/')[1], c)
+            generics = c % 2 and '<T>' or ''
+            declared.append((modname, name, generics))
+    covers = list(BASE_COVERS)
+    symbols = 0
+
+    sdkdir = os.path.join(outdir, 'sdk')
+    for modname in modnames:
+        lines = [modname, '=' * len(modname), '',
+                 '.. module:: %s' % modname, '']
+        symbols += 1
+        for f in range(3):
+            lines.append('.. function:: func%d (%s) -> %s' % (
+                f, _params(rng, 3, declared, covers, 0),
+                _typeref(rng, declared, covers)))
+            lines.append('    ')
+            symbols += 1
+        for mod, name, generics in declared:
+            if mod != modname:
+                continue
+            directive = generics and 'class' or 'cover'
+            lines.append('.. %s:: %s%s' % (directive, name, generics))
+            lines.append('    ')
+            lines.append('    :extends: %s' % _typeref(rng, declared, covers))
+            lines.append('    .. staticmethod:: new -> :%s:`~%s %s%s` ' % (
+                directive, modname, name, generics))
+            lines.append('        ')
+            lines.append('    .. method:: init')
+            lines.append('        ')
+            symbols += 3
+            for m in range(members):
+                if m % 4 == 3:
+                    lines.append('    .. field:: field%d -> %s' % (
+                        m, _typeref(rng, declared, covers)))
+                    lines.append('    ')
+                else:
+                    suffix = m % 3 == 1 and '~with%d' % m or ''
+                    lines.append('    .. method:: method%d%s (%s) -> %s' % (
+                        m, suffix,
+                        _params(rng, 1 + m % 4, declared, covers,
+                                m % 2 and depth or 0),
+                        _typeref(rng, declared, covers)))
+                    lines.append('        ')
+                    lines.append('        Returns something, see %s.' %
+                                 _typeref(rng, declared, covers).strip())
+                    lines.append('        ')
+                symbols += 1
+        filename = os.path.join(sdkdir, *(modname + '.rst').split('/'))
+        if not os.path.isdir(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
+        f = open(filename, 'w')
+        f.write('\n'.join(lines) + '\n')
+        f.close()
+
+    typeslines = ['lang/types', '==========', '', '.. module:: lang/types',
+                  '']
+    for cover in BASE_COVERS:
+        typeslines.extend(['.. cover:: %s' % cover, '    ',
+                           '    :from: ``%s``' % cover.lower()])
+        symbols += 1
+    if not os.path.isdir(os.path.join(sdkdir, 'lang')):
+        os.makedirs(os.path.join(sdkdir, 'lang'))
+    f = open(os.path.join(sdkdir, 'lang', 'types.rst'), 'w')
+    f.write('\n'.join(typeslines) + '\n')
+    f.close()
+
+    index = ['ooc-bench', '=========', '', '.. toctree::', '   :glob:', '',
+             '   sdk/*/*', '']
+    f = open(os.path.join(outdir, 'index.rst'), 'w')
+    f.write('\n'.join(index))
+    f.close()
+    f = open(os.path.join(outdir, 'conf.py'), 'w')
+    f.write(CONF % {'root': root})
+    f.close()
+    return symbols
+
+def main(argv):
+    if len(argv) < 2:
+        print(__doc__.strip().splitlines()[-1])
+        return 2
+    args = [int(arg) for arg in argv[2:5]]
+    print('%d symbols' % generate_corpus(argv[1], *args))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
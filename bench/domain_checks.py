@@ -0,0 +1,148 @@
+"""
+    Checks of the ooc domain's bookkeeping across incremental builds.
+
+    Builds small projects in a temporary directory, changes them and builds
+    them again, then looks at the symbol table and the warnings:
+
+    * ``duplicates``: two pages declare the same function; when the page
+      that owns it is removed, the other declaration must take over again
+      instead of the symbol going missing;
+    * ``inventory``: a ``.put`` reference matching methods of two classes
+      in an inventory of ``ooc_inventories`` must warn that it is
+      ambiguous, like one to the project's own symbols does.
+
+    Exits with status 1 if any check fails, so it can run in CI.
+
+    Usage: python bench/domain_checks.py
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+from sphinx.application import Sphinx
+from sphinx.util.docutils import docutils_namespace
+
+CONF = "extensions = ['sphinx_ooc']\nmaster_doc = 'index'\n"
+
+def write(srcdir, files):
+    for name, text in files.items():
+        f = io.open(os.path.join(srcdir, name), 'w', encoding='utf-8')
+        try:
+            f.write(text)
+        finally:
+            f.close()
+
+def build(srcdir):
+    """
+        Build the project in *srcdir* incrementally; returns ``(app,
+        warnings)``.
+    """
+    warnings = io.StringIO()
+    outdir = os.path.join(srcdir, '_build')
+    # each build registers its nodes and roles anew
+    with docutils_namespace():
+        app = Sphinx(srcdir, srcdir, outdir,
+                     os.path.join(outdir, '.doctrees'), 'html',
+                     status=None, warning=warnings)
+        app.build()
+    return app, warnings.getvalue()
+
+def check_duplicates(srcdir, failures):
+    write(srcdir, {
+        'conf.py': CONF,
+        'index.rst': '.. toctree::\n\n   a\n   b\n   c\n',
+        'a.rst': 'A\n=\n\n.. ooc:function:: dup (a: Int)\n',
+        'b.rst': 'B\n=\n\n.. ooc:function:: dup (b: Int)\n',
+        'c.rst': 'C\n=\n\nSee :ooc:func:`dup`.\n',
+    })
+    app, warnings = build(srcdir)
+    data = app.env.get_domain('ooc').data
+    owner = data['objects']['dup'][0]
+    other = owner == 'a' and 'b' or 'a'
+    os.remove(os.path.join(srcdir, owner + '.rst'))
+    write(srcdir, {'index.rst': '.. toctree::\n\n   %s\n   c\n' % other})
+    app, warnings = build(srcdir)
+    data = app.env.get_domain('ooc').data
+    entry = data['objects'].get('dup')
+    if entry is None or entry[0] != other:
+        failures.append('duplicates: after removing %s, dup is %r, not '
+                        'declared in %s' % (owner, entry, other))
+    elif data['signatures'].get('dup') != 'dup (%s: Int)' % other:
+        failures.append('duplicates: signature of dup is %r'
+                        % data['signatures'].get('dup'))
+    if 'dup' not in data['shortnames'].get('dup', ()):
+        failures.append('duplicates: dup missing from the short names')
+    if data['shadowed']:
+        failures.append('duplicates: shadowed entries left: %r'
+                        % data['shadowed'])
+    if 'reference target not found' in warnings:
+        failures.append('duplicates: %s' % warnings.strip())
+
+INVENTORY = [
+    'structs/HashBag ooc:module 0 structs/HashBag.html#module-$ -',
+    'structs/HashBag HashBag put ooc:method 1 structs/HashBag.html#$ -',
+    'structs/HashMap HashMap<K,V> put ooc:method 1 '
+    'structs/HashMap.html#$ -',
+    'structs/HashMap HashMap<K,V> get ooc:method 1 '
+    'structs/HashMap.html#$ -',
+]
+
+def check_inventory(srcdir, failures):
+    f = open(os.path.join(srcdir, 'sdk.inv'), 'wb')
+    try:
+        f.write(b'# Sphinx inventory version 2\n# Project: sdk\n'
+                b'# Version: 1\n# The remainder of this file is '
+                b'compressed using zlib.\n')
+        f.write(zlib.compress('\n'.join(INVENTORY).encode('utf-8')))
+    finally:
+        f.close()
+    write(srcdir, {
+        'conf.py': CONF + "ooc_inventories = {'sdk': ('https://sdk/', "
+                          "'sdk.inv')}\n",
+        'index.rst': 'Index\n=====\n\n:ooc:meth:`.put`, :ooc:meth:`.get`\n',
+    })
+    app, warnings = build(srcdir)
+    if "more than one target found for cross-reference 'put'" \
+            not in warnings:
+        failures.append('inventory: no warning for .put: %r' % warnings)
+    if "cross-reference 'get'" in warnings:
+        failures.append('inventory: warning for .get: %r' % warnings)
+    f = io.open(os.path.join(srcdir, '_build', 'index.html'),
+                encoding='utf-8')
+    try:
+        html = f.read()
+    finally:
+        f.close()
+    for uri in ('structs/HashBag.html#structs/HashBag HashBag put',
+                'structs/HashMap.html#structs/HashMap HashMap<K,V> get'):
+        if 'https://sdk/' + uri.replace('<', '&lt;').replace('>', '&gt;') \
+                not in html:
+            failures.append('inventory: no link to %s' % uri)
+
+CHECKS = [
+    ('duplicates', check_duplicates),
+    ('inventory', check_inventory),
+]
+
+def main(argv):
+    failures = []
+    for name, check in CHECKS:
+        srcdir = tempfile.mkdtemp(prefix='ooc-' + name)
+        try:
+            check(srcdir, failures)
+        finally:
+            shutil.rmtree(srcdir)
+    for failure in failures:
+        sys.stdout.write('FAIL: %s\n' % failure)
+    sys.stdout.write('%d checks, %d failures\n' % (len(CHECKS),
+                                                   len(failures)))
+    return failures and 1 or 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,147 @@
+"""
+    Highlighting throughput benchmark.
+
+    Generates a large synthetic ooc file from the snippets in the docs'
+    code blocks style (classes, covers, generics, function suffixes,
+    comments, strings) and times tokenizing and highlighting it to HTML
+    with the bundled :class:`sphinx_ooc.highlight.OOCLexer` and, for
+    comparison, the ``OocLexer`` shipped with Pygments. Also checks that the
+    bundled lexer gives back the input unchanged.
+
+    Usage: python bench/highlight.py [-s SIZE_KB] [-r REPEAT]
+"""
+import optparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+from pygments import highlight
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import get_lexer_by_name
+
+from sphinx_ooc.highlight import OOCLexer
+
+SNIPPETS = [
+    '''\
+include stdio, stdlib, unistd
+
+import structs/[ArrayList, HashMap]
+use gtk
+
+/* A map from names to %(klass)s lists.
+ * Keys are compared by value. */
+%(klass)sMap: class <K, V> extends HashMap<K, ArrayList<V>> {
+    count := 0
+    name: String
+    cache: static %(klass)s* = null
+
+    init: func ~withName (=name) {
+        super()
+    }
+
+    put: func (key: K, value: V) -> Bool {
+        list := get(key)
+        if (list == null) {
+            list = ArrayList<V> new()
+            super put(key, list)
+        }
+        list add(value)
+        count += 1
+        return true
+    }
+''',
+    '''\
+    each: func (f: Func (K, V) -> Bool) {
+        for (i in 0..count) {
+            // skip the deleted entries
+            if (buckets[i] != null && !f(buckets[i] key, buckets[i] value))
+                break
+        }
+    }
+}
+''',
+    '''\
+%(klass)sStruct: cover from struct _%(klass)s {
+    name: extern(m_name) String
+    age: extern(m_age) Int
+    flags: UInt = 0x%(hex)s
+}
+
+%(func)s: extern func (entry: %(klass)sStruct*, size: SizeT) -> Int
+
+main: func -> Int {
+    s := "%(func)s: \\"%%s\\"\\n" format("x")
+    c := '\\n'
+    printf("%%d %%f\\n", 42, 3.14)
+    x: Int = 0b1010 + 0c17 * %(num)d
+    match (x) {
+        case 1 => "one" println()
+        case => "other" println()
+    }
+    return 0
+}
+''',
+]
+
+def generate_source(size):
+    """
+        Return about *size* bytes of ooc code.
+    """
+    rng = random.Random(0)
+    parts = []
+    total = 0
+    while total < size:
+        snippet = rng.choice(SNIPPETS) % {
+            'klass': rng.choice(['Entry', 'Person', 'Node', 'Token']),
+            'func': rng.choice(['print_entry', 'create', 'dispose']),
+            'hex': '%x' % rng.randint(0, 0xffff),
+            'num': rng.randint(0, 1000),
+        }
+        parts.append(snippet)
+        total += len(snippet)
+    return ''.join(parts)
+
+def best_of(repeat, function):
+    times = []
+    for i in range(repeat):
+        start = time.time()
+        function()
+        times.append(time.time() - start)
+    return min(times)
+
+def main(argv):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('-s', '--size', type='int', default=1024,
+                      help='size of the generated source in KB')
+    parser.add_option('-r', '--repeat', type='int', default=3)
+    options, args = parser.parse_args(argv[1:])
+    source = generate_source(options.size * 1024)
+    megabytes = len(source) / 1024.0 / 1024.0
+
+    lexer = OOCLexer()
+    text = ''.join([value for index, token, value
+                    in lexer.get_tokens_unprocessed(source)])
+    if text != source:
+        sys.stderr.write('OOCLexer does not round-trip the source\n')
+        return 1
+
+    formatter = HtmlFormatter()
+    sys.stdout.write('%.1f MB of ooc code, best of %d\n' % (
+        megabytes, options.repeat))
+    sys.stdout.write('%-22s %10s %10s\n' % ('lexer', 'tokens', 'html'))
+    for label, lexer in [('sphinx_ooc OOCLexer', OOCLexer()),
+                         ('pygments OocLexer', get_lexer_by_name('ooc'))]:
+        tokenize = best_of(options.repeat, lambda: list(
+            lexer.get_tokens_unprocessed(source)))
+        html = best_of(options.repeat, lambda: highlight(source, lexer,
+                                                         formatter))
+        sys.stdout.write('%-22s %7.2f MB/s %5.2f MB/s\n' % (
+            label, megabytes / tokenize, megabytes / html))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,88 @@
+"""
+    Import time budget of the ooc extension.
+
+    Imports each module in a fresh interpreter and measures the time the
+    import takes (best of --repeat runs). The pure modules, which the
+    command line tools and the bench scripts use, must not pull in Sphinx,
+    docutils or Pygments and must stay within the budget; the modules of
+    the extension proper are measured for comparison only. Exits with
+    status 1 if a pure module breaks either rule, so it can run in CI.
+
+    Usage: python bench/importtime.py [-b BUDGET_MS] [-r REPEAT]
+"""
+import json
+import optparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+PURE_MODULES = [
+    'sphinx_ooc',
+    'sphinx_ooc.symbols',
+    'sphinx_ooc.signature',
+    'sphinx_ooc.typeexpr',
+    'sphinx_ooc.apiformat',
+    'sphinx_ooc.apigen',
+    'sphinx_ooc.fileutil',
+    'sphinx_ooc.coverage',
+    'sphinx_ooc.xrefcheck',
+    'sphinx_ooc.watch',
+]
+EXTENSION_MODULES = [
+    'sphinx_ooc.domain',
+    'sphinx_ooc.highlight',
+]
+FORBIDDEN = ('sphinx', 'docutils', 'pygments')
+
+CHILD = '''
+import json, sys, time
+start = time.time()
+__import__(sys.argv[1])
+elapsed = time.time() - start
+print(json.dumps([elapsed, [name for name in %r if name in sys.modules]]))
+''' % (FORBIDDEN,)
+
+def measure(module, repeat):
+    """
+        Return ``(best import time in seconds, forbidden modules imported)``
+        for *module*.
+    """
+    times = []
+    forbidden = []
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ROOT] + [path for path in [env.get('PYTHONPATH')] if path])
+    for i in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, '-c', CHILD, module], env=env)
+        elapsed, forbidden = json.loads(output.decode('utf-8'))
+        times.append(elapsed)
+    return min(times), forbidden
+
+def main(argv):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('-b', '--budget', type='float', default=100.0,
+                      help='import time budget of a pure module in ms')
+    parser.add_option('-r', '--repeat', type='int', default=5)
+    options, args = parser.parse_args(argv[1:])
+    failed = False
+    sys.stdout.write('%-24s %9s  %s\n' % ('module', 'import', 'status'))
+    for module in PURE_MODULES + EXTENSION_MODULES:
+        elapsed, forbidden = measure(module, options.repeat)
+        status = ''
+        if module in PURE_MODULES:
+            if forbidden:
+                status = 'FAIL: imports ' + ', '.join(forbidden)
+            elif elapsed * 1000 > options.budget:
+                status = 'FAIL: over the budget of %.0f ms' % options.budget
+            else:
+                status = 'ok'
+            failed = failed or status != 'ok'
+        sys.stdout.write('%-24s %6.1f ms  %s\n' % (module, elapsed * 1000,
+                                                   status))
+    return failed and 1 or 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,164 @@
+"""
+    Build benchmark for the ooc extension.
+
+    For each scale (number of modules) a synthetic SDK is generated with
+    :mod:`corpus` and built with Sphinx, offline, in a fresh process. Each
+    build reports wall time, peak RSS, the size of the pickled environment
+    and doctrees and the time spent reading (parsing and merging the
+    environment), resolving cross-references and writing.
+    The results are printed as a table on stderr and as JSON on stdout (or
+    written to --output), so they can be compared between revisions.
+
+    Usage: python bench/sdkbench.py [-s 50,200,800] [-b html] [-j N]
+                                    [-o results.json]
+"""
+import json
+import optparse
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import generate_corpus
+
+def _disk_usage(path):
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            total += os.path.getsize(os.path.join(dirpath, filename))
+    return total
+
+def run_child(srcdir, outdir, builder, jobs):
+    """
+        Build *srcdir* in this process and return the measurements.
+    """
+    import resource
+    try:
+        from StringIO import StringIO
+    except ImportError:
+        from io import StringIO
+    import sphinx
+    from sphinx.application import Sphinx
+
+    marks = {}
+    resolve = [0.0, 0]
+
+    def mark(name):
+        def handler(app, *args):
+            marks[name] = time.time()
+        return handler
+
+    start = time.time()
+    warnings = StringIO()
+    doctreedir = os.path.join(outdir, '.doctrees')
+    app = Sphinx(srcdir, srcdir, outdir, doctreedir,
+                 builder, status=None, warning=warnings, freshenv=True,
+                 parallel=jobs)
+    app.connect('env-before-read-docs', mark('read'))
+    app.connect('env-updated', mark('write'))
+    app.connect('build-finished', mark('finished'))
+    # cross-references are resolved in the main process, also for
+    # parallel writes. Patch the class: the environment gets pickled.
+    envclass = type(app.env)
+    resolver = hasattr(envclass, 'apply_post_transforms') and \
+        'apply_post_transforms' or 'resolve_references'
+    original = getattr(envclass, resolver)
+
+    def timed_resolve(*args, **kwargs):
+        t = time.time()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            resolve[0] += time.time() - t
+            resolve[1] += 1
+    setattr(envclass, resolver, timed_resolve)
+    app.build()
+    end = time.time()
+    return {
+        'wall': end - start,
+        'read': marks['write'] - marks['read'],
+        'resolve': resolve[0],
+        'write': marks['finished'] - marks['write'] - resolve[0],
+        'documents': resolve[1],
+        'warnings': len(warnings.getvalue().splitlines()),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'env_pickle_kb': os.path.getsize(os.path.join(
+            doctreedir, 'environment.pickle')) // 1024,
+        'doctrees_kb': _disk_usage(doctreedir) // 1024,
+        'sphinx': sphinx.__version__,
+    }
+
+def run_scale(modules, options):
+    tmpdir = tempfile.mkdtemp(prefix='ooc-bench-')
+    try:
+        srcdir = os.path.join(tmpdir, 'src')
+        symbols = generate_corpus(srcdir, modules, options.classes,
+                                  options.members, options.depth)
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), '--child', srcdir,
+             os.path.join(tmpdir, 'build'), options.builder,
+             str(options.jobs)])
+        result = json.loads(output.decode('utf-8').splitlines()[-1])
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    result.update({
+        'modules': modules,
+        'classes': options.classes,
+        'members': options.members,
+        'depth': options.depth,
+        'symbols': symbols,
+        'builder': options.builder,
+        'jobs': options.jobs,
+    })
+    return result
+
+def main(argv):
+    if len(argv) == 6 and argv[1] == '--child':
+        result = run_child(argv[2], argv[3], argv[4], int(argv[5]))
+        sys.stdout.write(json.dumps(result) + '\n')
+        return 0
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('-s', '--scales', default='50,200,800',
+                      help='comma separated module counts')
+    parser.add_option('-c', '--classes', type='int', default=5,
+                      help='classes per module')
+    parser.add_option('-m', '--members', type='int', default=10,
+                      help='members per class')
+    parser.add_option('-d', '--depth', type='int', default=4,
+                      help='nesting depth of generic parameters')
+    parser.add_option('-b', '--builder', default='html')
+    parser.add_option('-j', '--jobs', type='int', default=1,
+                      help='parallel Sphinx jobs')
+    parser.add_option('-o', '--output', default=None,
+                      help='write the JSON results to this file')
+    options, args = parser.parse_args(argv[1:])
+    results = []
+    sys.stderr.write('%8s %8s %8s %8s %8s %8s %8s %8s %8s\n' % (
+        'modules', 'symbols', 'wall', 'read', 'resolve', 'write', 'rss MB',
+        'env MB', 'trees MB'))
+    for scale in options.scales.split(','):
+        result = run_scale(int(scale), options)
+        results.append(result)
+        sys.stderr.write('%8d %8d %8.2f %8.2f %8.2f %8.2f %8.1f %8.2f %8.1f\n'
+                         % (result['modules'], result['symbols'],
+                            result['wall'], result['read'], result['resolve'],
+                            result['write'], result['peak_rss_kb'] / 1024.0,
+                            result['env_pickle_kb'] / 1024.0,
+                            result['doctrees_kb'] / 1024.0))
+    report = json.dumps({'python': platform.python_version(),
+                         'results': results}, indent=1, sort_keys=True)
+    if options.output:
+        f = open(options.output, 'w')
+        f.write(report + '\n')
+        f.close()
+    else:
+        sys.stdout.write(report + '\n')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
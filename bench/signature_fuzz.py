@@ -0,0 +1,262 @@
+"""
+    Fuzzing and timing of the signature parser.
+
+    Checks :mod:`sphinx_ooc.signature` against pathological signatures, as
+    a generated SDK from untrusted compiler output may have them:
+
+    * a table of pinned cases: the exact parse, or the error, of long
+      argument lists, unbalanced ``<``, ``~suffix`` names with generics
+      and ``Func`` types with nested parentheses;
+    * random signatures from a small grammar, whose parse is known, and
+      random mutations of them, which must either parse to something that
+      parses again the same when written back or raise
+      :exc:`SignatureError` (and nothing else);
+    * families of inputs that grow up to ``--max-size`` characters, for
+      which the parse time must grow linearly: the time per character of
+      the largest input may be at most ``--slack`` times that of an input
+      an eighth of its size. Each family is built so that the parser has
+      to read all of it before it accepts or rejects it, and its time must
+      grow at least ``--min-growth`` times from the small to the large
+      input, or the check would measure nothing.
+
+    Exits with status 1 if any check fails, so it can run in CI.
+
+    Usage: python bench/signature_fuzz.py [-n COUNT] [-s SEED] [-m SIZE]
+"""
+import optparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+from sphinx_ooc.signature import Signature, SignatureError, _parse
+
+# signature -> Signature fields, or the message of the SignatureError
+PINNED = [
+    ('new~withCapacity<T> (capacity: Int) -> This',
+     (None, 'new~withCapacity<T>', True, ('capacity: Int',), 'This')),
+    ('List<T> get~index (i: Int) -> T',
+     ('List<T> ', 'get~index', True, ('i: Int',), 'T')),
+    ('each (f: Func (Func (T) -> Int, (A)) -> Bool)',
+     (None, 'each', True, ('f: Func (Func (T) -> Int, (A)) -> Bool',),
+      None)),
+    ('fold (f: Func (T, Func (T) -> T) -> T, init: T) -> T',
+     (None, 'fold', True, ('f: Func (T, Func (T) -> T) -> T', 'init: T'),
+      'T')),
+    ('map (a: Func -> Int) -> Func (A) -> B',
+     (None, 'map', True, ('a: Func -> Int',), 'Func (A) -> B')),
+    ('put (m: HashMap<K, List<V>>, b: Int[3], c: Char**)',
+     (None, 'put', True, ('m: HashMap<K, List<V>>', 'b: Int[3]',
+                          'c: Char**'), None)),
+    ('get (key: :class:`~structs/HashMap HashMap<K,V>` *)',
+     (None, 'get', True, ('key: :class:`~structs/HashMap HashMap<K,V>` *',),
+      None)),
+    ('f (%s)' % ', '.join(['a%d: Int' % i for i in range(500)]),
+     (None, 'f', True, tuple(['a%d: Int' % i for i in range(500)]), None)),
+    ('io/File File', ('io/File ', 'File', False, (), None)),
+    ('f(a:Int)->Int', (None, 'f', True, ('a:Int',), 'Int')),
+    ('f ()', (None, 'f', False, (), None)),
+    ('foo< (a: Int)', "unclosed '<'"),
+    ('Foo<T>> bar', "unbalanced '>'"),
+    ('f (a: List<Int)', "'<' at column 11 closed by ')'"),
+    ('f (a: List<Int>', "missing ')'"),
+    ('f (a: Int))', 'unexpected text'),
+    ('f (x: Func (A, B -> C)', "missing ')'"),
+    ('f (a: `unterminated)', 'unterminated inline markup'),
+    ('~withSuffix (a: Int)', 'invalid name'),
+    ('<T> f', 'invalid name'),
+    ('f -> ', 'missing return type'),
+    ('', 'invalid name'),
+]
+
+NAMES = ['a', 'key', 'value', 'f', 'count', 'x1']
+TYPES = ['Int', 'String', 'T', 'K', 'V', 'Pointer', 'SizeT']
+
+def random_type(rng, depth):
+    """
+        Return a random type annotation, at most *depth* levels deep.
+    """
+    choice = depth and rng.randrange(6) or 0
+    if choice == 0:
+        return rng.choice(TYPES)
+    elif choice == 1:
+        return '%s<%s>' % (rng.choice(['List', 'HashMap', 'Stack']),
+                           ', '.join([random_type(rng, depth - 1) for i
+                                      in range(rng.randint(1, 3))]))
+    elif choice == 2:
+        return random_type(rng, depth - 1) + rng.choice(['*', '@', '[4]'])
+    elif choice == 3:
+        text = 'Func'
+        if rng.randrange(2):
+            text += ' (%s)' % ', '.join([random_type(rng, depth - 1) for i
+                                         in range(rng.randint(0, 3))])
+        if rng.randrange(2):
+            text += ' -> ' + random_type(rng, depth - 1)
+        return text
+    elif choice == 4:
+        return ':class:`~structs/List List<%s>`' % rng.choice(TYPES)
+    return '(%s)' % random_type(rng, depth - 1)
+
+def random_signature(rng):
+    """
+        Return ``(signature, expected Signature)`` for a random signature.
+    """
+    classname = None
+    if rng.randrange(4) == 0:
+        classname = rng.choice(['List<T> ', 'io/File ', 'structs/List '])
+    name = rng.choice(['new', 'get', 'each', 'init'])
+    if rng.randrange(2):
+        name += '~' + rng.choice(['withCapacity', 'index', 'all'])
+    if rng.randrange(3) == 0:
+        name += '<T>'
+    params = tuple(['%s%d: %s' % (rng.choice(NAMES), i,
+                                  random_type(rng, rng.randint(0, 4)))
+                    for i in range(rng.choice([0, 1, 2, 5, 40]))])
+    retann = rng.randrange(2) and random_type(rng, 3) or None
+    sig = (classname or '') + name
+    if params:
+        sig += ' (%s)' % ', '.join(params)
+    if retann:
+        sig += ' -> ' + retann
+    return sig, Signature(classname, name, bool(params), params, retann)
+
+def unparse(parsed):
+    sig = (parsed.classname or '') + parsed.name
+    if parsed.arglist:
+        sig += ' (%s)' % ', '.join(parsed.params)
+    if parsed.retann is not None:
+        sig += ' -> ' + parsed.retann
+    return sig
+
+def mutate(rng, sig):
+    chars = list(sig)
+    for i in range(rng.randint(1, 3)):
+        pos = rng.randint(0, len(chars))
+        if chars and rng.randrange(2):
+            del chars[min(pos, len(chars) - 1)]
+        else:
+            chars.insert(pos, rng.choice('<>()[],~`:- *@/'))
+    return ''.join(chars)
+
+def parse(sig):
+    try:
+        return _parse(sig)
+    except SignatureError as e:
+        return e.message
+
+def check_pinned(failures):
+    for sig, expected in PINNED:
+        result = parse(sig)
+        if isinstance(expected, tuple):
+            ok = result == expected
+        else:
+            ok = isinstance(result, str) and result.startswith(expected)
+        if not ok:
+            failures.append('pinned %r: expected %r, got %r'
+                            % (sig[:60], expected, result))
+
+def check_fuzz(rng, count, failures):
+    for i in range(count):
+        sig, expected = random_signature(rng)
+        result = parse(sig)
+        if result != expected:
+            failures.append('generated %r: expected %r, got %r'
+                            % (sig, expected, result))
+        mutated = mutate(rng, sig)
+        try:
+            result = _parse(mutated)
+        except SignatureError:
+            continue
+        except Exception as e:
+            failures.append('mutated %r: %s: %s' % (mutated,
+                                                    e.__class__.__name__, e))
+            continue
+        if parse(unparse(result)) != result:
+            failures.append('mutated %r: %r does not parse back'
+                            % (mutated, result))
+
+# families of inputs of about n characters, none of which can be rejected
+# before the end
+FAMILIES = [
+    ('slashes', lambda n: 'a' + '/' * n + '('),
+    ('class path', lambda n: 'a/' * (n // 2) + '('),
+    ('long name', lambda n: 'a' * n + ' (x)'),
+    ('open generics', lambda n: 'List' + '<' * n + ' f'),
+    ('name generics', lambda n: 'f' + '<' * n + ' (x)'),
+    ('commas', lambda n: 'f (' + ',' * n),
+    ('many params', lambda n: 'f (%s)' % ', '.join(
+        ['a%d: List<Int>' % i for i in range(n // 16)])),
+    ('nested Func', lambda n: 'f (x: %sT%s)' % ('Func (' * (n // 6),
+                                                ')' * (n // 6))),
+    ('unbalanced param', lambda n: 'f (x: ' + '<' * n + ')'),
+    ('unclosed markup', lambda n: 'f (x: ' + '`a` ' * (n // 4) + '`'),
+    ('spaces', lambda n: 'f' + ' ' * n + '-'),
+    ('return type', lambda n: 'f -> ' + 'List<' * (n // 5)),
+]
+
+timer = getattr(time, 'perf_counter', time.time)
+
+def parse_time(sig, repeat):
+    best = None
+    for i in range(repeat):
+        start = timer()
+        parse(sig)
+        elapsed = timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def check_timing(maxsize, slack, min_growth, repeat, failures):
+    sys.stdout.write('%-18s %12s %12s %8s %8s\n' % (
+        'family', 'us/char n/8', 'us/char n', 'ratio', 'growth'))
+    for name, family in FAMILIES:
+        small = family(maxsize // 8)
+        large = family(maxsize)
+        small_total = parse_time(small, repeat)
+        large_total = parse_time(large, repeat)
+        small_time = small_total / len(small)
+        large_time = large_total / len(large)
+        # a floor against timer resolution on tiny inputs
+        ratio = large_time / max(small_time, 1e-9)
+        growth = large_total / max(small_total, 1e-9)
+        sys.stdout.write('%-18s %12.4f %12.4f %8.2f %8.2f\n' % (
+            name, small_time * 1e6, large_time * 1e6, ratio, growth))
+        if growth < min_growth:
+            failures.append('%s: %d characters take %.1f times the time of '
+                            '%d; the input is not read' % (
+                                name, len(large), growth, len(small)))
+        if ratio > slack:
+            failures.append('%s: %.1f times slower per character at %d '
+                            'than at %d characters' % (
+                                name, ratio, len(large), len(small)))
+
+def main(argv):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('-n', '--count', type='int', default=2000,
+                      help='number of random signatures')
+    parser.add_option('-s', '--seed', type='int', default=0)
+    parser.add_option('-m', '--max-size', type='int', default=64000,
+                      help='size of the largest timed input')
+    parser.add_option('-r', '--repeat', type='int', default=5)
+    parser.add_option('--slack', type='float', default=3.0,
+                      help='allowed growth of the time per character')
+    parser.add_option('--min-growth', type='float', default=2.0,
+                      help='required growth of the time from the small to '
+                           'the large input')
+    options, args = parser.parse_args(argv[1:])
+    failures = []
+    check_pinned(failures)
+    check_fuzz(random.Random(options.seed), options.count, failures)
+    check_timing(options.max_size, options.slack, options.min_growth,
+                 options.repeat, failures)
+    for failure in failures:
+        sys.stdout.write('FAIL: %s\n' % failure)
+    sys.stdout.write('%d pinned cases, %d random signatures, %d failures\n'
+                     % (len(PINNED), options.count, len(failures)))
+    return failures and 1 or 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -70,6 +70,9 @@ exclude_trees = []
 # The reST default role (used for this markup: `text`) to use for all documents.
 #default_role = None
 
+# The domain of the unprefixed object directives and roles (.. class::, :cover:).
+primary_domain = 'ooc'
+
 # If true, '()' will be appended to :func: etc. cross-reference text.
 #add_function_parentheses = True
 
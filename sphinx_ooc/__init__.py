@@ -1,4 +1,42 @@
-from sphinx_ooc import roles, desc
+__version__ = '0.1'
 
 def setup(app):
-    pass
+    # the extension modules need Sphinx, the tools built on the pure ones
+    # (symbols, signature, typeexpr, apiformat, apigen, fileutil,
+    # xrefcheck, watch) must not pay for importing it: everything is
+    # imported here
+    from sphinx_ooc import desc
+    from sphinx_ooc.apiexport import OOCAPIBuilder
+    from sphinx_ooc.depgraph import setup_dependencies
+    from sphinx_ooc.domain import OOCDomain, OOCReferenceResolver, \
+        report_lookups
+    from sphinx_ooc.fragments import setup_fragments
+    from sphinx_ooc.highlight import setup_highlight
+    from sphinx_ooc.instrument import setup_instrument
+    from sphinx_ooc.inventory import setup_inventories
+    from sphinx_ooc.searchindex import setup_search_index
+    from sphinx_ooc.sigcache import setup_signature_cache
+    from sphinx_ooc.typeexpr import clear_type_table
+
+    app.add_domain(OOCDomain)
+    app.add_builder(OOCAPIBuilder)
+    app.add_post_transform(OOCReferenceResolver)
+    app.connect('build-finished', report_lookups)
+    app.add_config_value('ooc_hide_private', False, 'env')
+    app.connect('builder-inited', desc.clear_typeref_cache)
+    app.connect('builder-inited', clear_type_table)
+    setup_dependencies(app)
+    setup_fragments(app)
+    setup_instrument(app)
+    setup_inventories(app)
+    setup_search_index(app)
+    setup_signature_cache(app)
+    setup_highlight(app)
+    # all per-document state lives in env.ref_context and the domain data,
+    # which Sphinx pickles and merges back from the worker processes
+    return {
+        'version': __version__,
+        'env_version': OOCDomain.data_version,
+        'parallel_read_safe': True,
+        'parallel_write_safe': True,
+    }
@@ -0,0 +1,145 @@
+"""
+    The ``oocapi`` builder: exports the documented ooc symbols for tools.
+
+    ``sphinx-build -b oocapi`` reads the docs like any other builder and
+    writes the symbol table of the ooc domain, with what the directives put
+    into the doctrees (the parameters and return type of the signature, the
+    extended class and the description text), to ``ooc-api.bin`` and
+    ``ooc-api.json`` in the output directory. See :mod:`sphinx_ooc.apiformat`
+    for the file formats and the reader.
+"""
+import io
+import os
+
+from docutils import nodes
+
+from sphinx import addnodes
+from sphinx.builders import Builder
+from sphinx.locale import _
+from sphinx.util import logging
+
+from sphinx_ooc.apiformat import APISymbol, BINARY_NAME, JSON_NAME, \
+    dump_binary, dumps_json
+from sphinx_ooc.fileutil import write_if_changed
+from sphinx_ooc.signature import parse_signature, SignatureError
+from sphinx_ooc.symbols import plain_signature, split_anchor, page_modules
+from sphinx_ooc.typeexpr import parse_type, typed_params
+
+logger = logging.getLogger(__name__)
+
+def type_text(annotation):
+    """
+        Return the plain text of the type *annotation*, with the full
+        target of type references (``structs/List List<T>*``).
+    """
+    expr = parse_type(annotation)
+    if expr is not None:
+        return expr.text
+    return plain_signature(annotation)
+
+def signature_params(sig):
+    """
+        Return the ``(name, type)`` pairs of the parameters of *sig* and its
+        return type. Parameters without a type have the type of the next
+        one that has (see :func:`~sphinx_ooc.typeexpr.typed_params`), or an
+        empty one.
+    """
+    try:
+        signature = parse_signature(sig)
+    except SignatureError:
+        return (), ''
+    params = []
+    for name, annotation in typed_params(signature.params):
+        if annotation is None:
+            params.append((plain_signature(name), ''))
+        else:
+            params.append((name, type_text(annotation)))
+    returns = ''
+    if signature.retann:
+        returns = type_text(signature.retann)
+    return params, returns
+
+def _description(content):
+    # the paragraphs of the description, without nested objects and fields
+    texts = []
+    for node in content.children:
+        if isinstance(node, (addnodes.desc, addnodes.index,
+                             nodes.field_list)):
+            continue
+        text = node.astext().strip()
+        if text:
+            texts.append(text)
+    return '\n\n'.join(texts)
+
+def _field(content, label):
+    # the source text of a field, with its markup
+    for field_list in content.traverse(nodes.field_list):
+        if field_list.parent is not content:
+            continue
+        for field in field_list.children:
+            if field[0].astext() == label:
+                return ' '.join([node.rawsource or node.astext()
+                                 for node in field[1].traverse(
+                                     nodes.paragraph)]).strip()
+    return ''
+
+class OOCAPIBuilder(Builder):
+    """
+        Writes the ooc symbol table as a binary and a JSON file.
+    """
+    name = 'oocapi'
+    format = 'oocapi'
+    epilog = 'The API export is in %(outdir)s.'
+
+    def init(self):
+        self.symbols = {}
+
+    def get_outdated_docs(self):
+        # the export covers all documents
+        return self.env.found_docs
+
+    def get_target_uri(self, docname, typ=None):
+        return docname
+
+    def prepare_writing(self, docnames):
+        domain = self.env.get_domain('ooc')
+        self.docmodules = page_modules(domain.data['modules'])
+        self.anchors = {}
+        for key, (docname, objtype, anchor) in \
+                domain.data['objects'].items():
+            self.anchors[docname, anchor] = key
+
+    def write_doc(self, docname, doctree):
+        domain = self.env.get_domain('ooc')
+        signatures = domain.data['signatures']
+        modnames = self.docmodules.get(docname, ())
+        for desc in doctree.traverse(addnodes.desc):
+            if desc.get('domain') != 'ooc':
+                continue
+            content = desc.children[-1]
+            doc = _description(content)
+            extends = _field(content, _('Extends'))
+            extends = extends and type_text(extends)
+            for signode in desc.traverse(addnodes.desc_signature):
+                if signode.parent is not desc or not signode['ids']:
+                    continue
+                anchor = signode['ids'][0]
+                key = self.anchors.get((docname, anchor))
+                if key is None:
+                    continue
+                sig = signatures.get(key, '')
+                params, returns = signature_params(sig)
+                self.symbols[key] = APISymbol(
+                    key, desc['objtype'], split_anchor(anchor, modnames)[0]
+                    or '', anchor, docname, plain_signature(sig), returns,
+                    extends, doc, params)
+
+    def finish(self):
+        symbols = list(self.symbols.values())
+        data = io.BytesIO()
+        dump_binary(symbols, data)
+        write_if_changed(os.path.join(self.outdir, BINARY_NAME),
+                         data.getvalue())
+        write_if_changed(os.path.join(self.outdir, JSON_NAME),
+                         dumps_json(symbols))
+        logger.info('exported %d ooc symbols', len(symbols))
@@ -0,0 +1,276 @@
+"""
+    The machine readable ooc API export.
+
+    The ``oocapi`` builder (see :mod:`sphinx_ooc.apiexport`) writes the
+    documented symbols to ``ooc-api.bin`` and, for clients that cannot map
+    binary files, ``ooc-api.json``. Both hold the same records, sorted by
+    symbol key (see :mod:`sphinx_ooc.symbols`).
+
+    The binary file is little endian and made to be memory mapped:
+
+    * a header: the magic ``OOCAPI\\0\\0`` and the format version, the
+      number of symbols and the offsets of the string table, the index
+      and the records (all unsigned 32 bit);
+    * the string table, every distinct string once, UTF-8 encoded; a
+      string is referred to by its offset in the table and its length in
+      bytes, so the documentation text of a symbol is just such a pair;
+    * the index, the offsets of the records relative to the records
+      section, in the order of their symbol keys (compared as UTF-8
+      bytes), for binary search;
+    * the records: the strings key, kind, module, anchor, page,
+      signature, return type, extends and documentation, the number of
+      parameters and, for each parameter, the strings name and type.
+
+    :class:`APIReader` reads the binary file without loading it,
+    :class:`JSONAPIReader` the JSON file with the same interface;
+    :func:`open_api` picks the right one.
+"""
+import bisect
+import json
+import mmap
+import struct
+
+from sphinx_ooc.symbols import symbol_key
+
+MAGIC = b'OOCAPI\0\0'
+FORMAT_VERSION = 1
+BINARY_NAME = 'ooc-api.bin'
+JSON_NAME = 'ooc-api.json'
+
+FIELDS = ('key', 'kind', 'module', 'anchor', 'page', 'signature', 'returns',
+          'extends', 'doc')
+
+_header = struct.Struct('<8sIIIII')
+_record = struct.Struct('<%dI' % (2 * len(FIELDS) + 1))
+_param = struct.Struct('<4I')
+_offset = struct.Struct('<I')
+
+class APISymbol(tuple):
+    """
+        A documented symbol: the strings in :data:`FIELDS` (empty if not
+        applicable) and *params*, a tuple of ``(name, type)`` pairs.
+    """
+    __slots__ = ()
+
+    def __new__(cls, key, kind, module, anchor, page, signature, returns,
+                extends, doc, params):
+        return tuple.__new__(cls, (key, kind, module, anchor, page,
+                                   signature, returns, extends, doc,
+                                   tuple([tuple(param)
+                                          for param in params])))
+
+    key = property(lambda self: self[0])
+    kind = property(lambda self: self[1])
+    module = property(lambda self: self[2])
+    anchor = property(lambda self: self[3])
+    page = property(lambda self: self[4])
+    signature = property(lambda self: self[5])
+    returns = property(lambda self: self[6])
+    extends = property(lambda self: self[7])
+    doc = property(lambda self: self[8])
+    params = property(lambda self: self[9])
+
+    def __repr__(self):
+        return 'APISymbol(%r, %r)' % (self.key, self.kind)
+
+    def as_dict(self):
+        data = dict(zip(FIELDS, self))
+        data['params'] = [list(param) for param in self.params]
+        return data
+
+def _encode(text):
+    if not isinstance(text, bytes):
+        text = text.encode('utf-8')
+    return text
+
+def dump_binary(symbols, f):
+    """
+        Write the :class:`APISymbol` objects *symbols* to the binary file
+        *f* (opened for writing bytes).
+    """
+    symbols = sorted(symbols, key=lambda symbol: _encode(symbol.key))
+    strings = []
+    positions = {}
+    size = [0]
+
+    def ref(text):
+        data = _encode(text)
+        if data not in positions:
+            positions[data] = size[0]
+            strings.append(data)
+            size[0] += len(data)
+        return positions[data], len(data)
+
+    records = []
+    offsets = []
+    offset = 0
+    for symbol in symbols:
+        values = []
+        for field in symbol[:len(FIELDS)]:
+            values.extend(ref(field))
+        values.append(len(symbol.params))
+        record = [_record.pack(*values)]
+        for name, typename in symbol.params:
+            record.append(_param.pack(*(ref(name) + ref(typename))))
+        record = b''.join(record)
+        offsets.append(offset)
+        records.append(record)
+        offset += len(record)
+    strings_offset = _header.size
+    index_offset = strings_offset + size[0]
+    records_offset = index_offset + _offset.size * len(offsets)
+    f.write(_header.pack(MAGIC, FORMAT_VERSION, len(symbols),
+                         strings_offset, index_offset, records_offset))
+    f.write(b''.join(strings))
+    f.write(b''.join([_offset.pack(offset) for offset in offsets]))
+    f.write(b''.join(records))
+
+def dumps_json(symbols):
+    """
+        Return *symbols* as JSON text.
+    """
+    symbols = sorted(symbols, key=lambda symbol: _encode(symbol.key))
+    return json.dumps({'version': FORMAT_VERSION,
+                       'symbols': [symbol.as_dict() for symbol in symbols]},
+                      indent=0, sort_keys=True)
+
+def _version_message(filename, version):
+    return '%s is an ooc API export of version %s, not %d' % (
+        filename, version, FORMAT_VERSION)
+
+class APIReader(object):
+    """
+        Read access to a binary API export, memory mapped: only the pages
+        that are looked at are loaded.
+    """
+
+    def __init__(self, filename):
+        f = open(filename, 'rb')
+        try:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+        magic, version, self._count, self._strings, self._index, \
+            self._records = _header.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError('%s is no ooc API export' % filename)
+        if version != FORMAT_VERSION:
+            self._map.close()
+            raise ValueError(_version_message(filename, version))
+
+    def close(self):
+        self._map.close()
+
+    def __len__(self):
+        return self._count
+
+    def _bytes(self, offset, length):
+        start = self._strings + offset
+        return self._map[start:start + length]
+
+    def _record_offset(self, i):
+        return self._records + _offset.unpack_from(
+            self._map, self._index + _offset.size * i)[0]
+
+    def _key(self, i):
+        offset, length = _record.unpack_from(self._map,
+                                             self._record_offset(i))[:2]
+        return self._bytes(offset, length)
+
+    def __getitem__(self, i):
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        start = self._record_offset(i)
+        values = _record.unpack_from(self._map, start)
+        fields = [self._bytes(values[j], values[j + 1]).decode('utf-8')
+                  for j in range(0, 2 * len(FIELDS), 2)]
+        params = []
+        start += _record.size
+        for j in range(values[-1]):
+            param = _param.unpack_from(self._map, start + j * _param.size)
+            params.append((self._bytes(param[0], param[1]).decode('utf-8'),
+                           self._bytes(param[2], param[3]).decode('utf-8')))
+        return APISymbol(*(fields + [params]))
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def _bisect(self, key):
+        # the first position whose key is not less than *key*
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, name):
+        """
+            Return the symbol for *name* (a symbol path like
+            ``structs/HashMap HashMap<K,V> put``), or None.
+        """
+        key = _encode(symbol_key(name))
+        i = self._bisect(key)
+        if i < self._count and self._key(i) == key:
+            return self[i]
+        return None
+
+    def prefixed(self, prefix):
+        """
+            Iterate over the symbols whose key starts with *prefix*, e.g.
+            all members of a class.
+        """
+        prefix = _encode(prefix)
+        i = self._bisect(prefix)
+        while i < self._count and self._key(i).startswith(prefix):
+            yield self[i]
+            i += 1
+
+class JSONAPIReader(APIReader):
+    """
+        :class:`APIReader` for the JSON export, which is loaded whole.
+    """
+
+    def __init__(self, filename):
+        f = open(filename)
+        try:
+            data = json.load(f)
+        finally:
+            f.close()
+        if data.get('version') != FORMAT_VERSION:
+            raise ValueError(_version_message(filename,
+                                              data.get('version')))
+        self._symbols = [APISymbol(**symbol) for symbol in data['symbols']]
+        self._keys = [_encode(symbol.key) for symbol in self._symbols]
+        self._count = len(self._symbols)
+
+    def close(self):
+        pass
+
+    def _key(self, i):
+        return self._keys[i]
+
+    def _bisect(self, key):
+        return bisect.bisect_left(self._keys, key)
+
+    def __getitem__(self, i):
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        return self._symbols[i]
+
+def open_api(filename):
+    """
+        Return a reader for the API export *filename*, binary or JSON.
+    """
+    f = open(filename, 'rb')
+    try:
+        magic = f.read(len(MAGIC))
+    finally:
+        f.close()
+    if magic == MAGIC:
+        return APIReader(filename)
+    return JSONAPIReader(filename)
@@ -0,0 +1,457 @@
+"""
+    Generate the SDK reference pages from the compiler's JSON output.
+
+    The compiler writes one JSON file per module (see
+    ``source/compilers/json.rst``). Each file is turned into one reST page
+    with ``.. module::``, ``.. class::``, ``.. method::`` and friends. Files
+    are processed by a pool of worker processes, one module at a time, and
+    a page is only rewritten (atomically) if its content changed, so
+    Sphinx's incremental build does not re-read untouched pages.
+
+    A manifest in the output directory remembers, per module, the hashes of
+    the input JSON and of the written page, the types the module declares
+    and how the types its page refers to were resolved. On the next run
+    only modules whose input or page changed, or whose referenced types
+    moved, were renamed or appeared, are rendered again, and the pages of
+    modules whose input is gone are removed.
+
+    Usage: python -m sphinx_ooc.apigen [-j N] JSONDIR OUTDIR
+"""
+import codecs
+import hashlib
+import json
+import multiprocessing
+import optparse
+import os
+import sys
+
+from sphinx_ooc.fileutil import write_if_changed
+
+# directive for each JSON entity type; everything else is skipped
+MEMBER_DIRECTIVES = {
+    'function': 'function',
+    'globalVariable': 'var',
+    'method': 'method',
+    'field': 'field',
+    'class': 'class',
+    'cover': 'cover',
+}
+
+TYPE_ROLES = {
+    'class': 'class',
+    'cover': 'cover',
+    'interface': 'class',
+}
+
+MANIFEST_NAME = '.apigen-manifest.json'
+# bump whenever the rendering changes, so that all pages are regenerated
+RENDER_VERSION = 2
+
+def iter_json_files(jsondir):
+    """
+        Yield the paths of all ``.json`` files below *jsondir*, sorted.
+    """
+    for dirpath, dirnames, filenames in os.walk(jsondir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith('.json'):
+                yield os.path.join(dirpath, filename)
+
+def load_module(path):
+    f = codecs.open(path, 'r', 'utf-8')
+    try:
+        return json.load(f)
+    finally:
+        f.close()
+
+def iter_entities(members):
+    """
+        Yield the first version of each entity in a `members` list-of-lists.
+    """
+    for member in members or ():
+        if len(member) > 1:
+            yield member[1]
+
+def parse_tag(tag):
+    """
+        Parse a tag of the JSON tag mini language into a ``(modifier,
+        parameters)`` tuple. Plain identifiers have no parameters and
+        ``None`` as their parameter list.
+    """
+    tag = tag.strip()
+    paren = tag.find('(')
+    if paren == -1 or not tag.endswith(')'):
+        return tag, None
+    params = []
+    depth = 0
+    start = paren + 1
+    for i in range(start, len(tag) - 1):
+        char = tag[i]
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and not depth:
+            params.append(tag[start:i].strip())
+            start = i + 1
+    params.append(tag[start:-1].strip())
+    return tag[:paren].strip(), params
+
+def class_display_name(entity):
+    generics = entity.get('genericTypes')
+    if generics:
+        return '%s<%s>' % (entity['name'], ','.join(generics))
+    return entity['name']
+
+def declared_types(data):
+    """
+        Return ``[[name, role, display name], ...]`` for the types declared
+        in the module *data*.
+    """
+    types = []
+    for entity in iter_entities(data.get('entities')):
+        role = TYPE_ROLES.get(entity.get('type'))
+        if role is not None:
+            types.append([entity['name'], role, class_display_name(entity)])
+    return types
+
+def content_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+class ModuleRenderer(object):
+    """
+        Renders a module's JSON data as reST, in the layout of the pages in
+        ``source/sdk``.
+    """
+
+    def __init__(self, types):
+        self.types = types
+        # every type name looked up while rendering
+        self.used = set()
+
+    def type_parts(self, tag):
+        """
+            Return ``(base, suffix)`` for a type tag, e.g.
+            ``(':cover:`~lang/types Char`', '*')`` for ``pointer(Char)``.
+        """
+        modifier, params = parse_tag(tag)
+        if params is None:
+            self.used.add(modifier)
+            known = self.types.get(modifier)
+            if known is None:
+                return modifier, ''
+            module, role, display = known
+            return ':%s:`~%s %s`' % (role, module, display), ''
+        if modifier == 'pointer':
+            base, suffix = self.type_parts(params[0])
+            return base, suffix + '*'
+        elif modifier == 'reference':
+            base, suffix = self.type_parts(params[0])
+            return base, suffix + '@'
+        elif modifier == 'array':
+            base, suffix = self.type_parts(params[0])
+            return base, suffix + '[%s]' % ''.join(params[1:])
+        elif modifier == 'multi':
+            return ', '.join([self.type_text(param) for param in params]), ''
+        return tag, ''
+
+    def type_text(self, tag):
+        return '%s %s' % self.type_parts(tag)
+
+    def signature(self, entity):
+        sig = entity['name']
+        args = entity.get('arguments')
+        if args:
+            rendered = []
+            names = []
+            for i, arg in enumerate(args):
+                name, tag = arg[0], arg[1]
+                if name == '...':
+                    rendered.append('...')
+                    continue
+                if not name:
+                    rendered.append(self.type_text(tag))
+                    continue
+                names.append(name)
+                # consecutive arguments of one type share the annotation
+                if i + 1 < len(args) and args[i + 1][0] and \
+                        args[i + 1][0] != '...' and args[i + 1][1] == tag:
+                    continue
+                rendered.append('%s: %s' % (', '.join(names),
+                                            self.type_text(tag)))
+                names = []
+            sig += ' (%s)' % ', '.join(rendered)
+        rettype = entity.get('returnType') or entity.get('varType')
+        if rettype:
+            sig += ' -> ' + self.type_text(rettype)
+        return sig
+
+    def directive(self, entity):
+        kind = entity['type']
+        directive = MEMBER_DIRECTIVES[kind]
+        if kind == 'method' and 'static' in (entity.get('modifiers') or ()):
+            directive = 'staticmethod'
+        if kind in ('class', 'cover'):
+            return '.. %s:: %s' % (directive, class_display_name(entity))
+        return '.. %s:: %s' % (directive, self.signature(entity))
+
+    def doc_lines(self, doc, indent):
+        lines = []
+        if doc and doc.strip():
+            for line in doc.strip('\n').splitlines():
+                lines.append(indent + line.rstrip())
+            lines.append(indent)
+            lines.append(indent)
+        return lines
+
+    def entity_lines(self, entity, indent):
+        kind = entity.get('type')
+        if kind not in MEMBER_DIRECTIVES:
+            return []
+        lines = [indent + self.directive(entity)]
+        inner = indent + '    '
+        if kind in ('class', 'cover'):
+            lines.append(inner)
+            lines.extend(self.doc_lines(entity.get('doc'), inner))
+            if entity.get('from'):
+                lines.append(inner + ':from: ``%s``' % entity['from'])
+            if entity.get('extends'):
+                lines.append(inner + ':extends: ' +
+                             self.type_text(entity['extends']))
+            if entity.get('from') or entity.get('extends'):
+                # the field list has to end before the members
+                lines.append(inner)
+            for member in iter_entities(entity.get('members')):
+                lines.extend(self.entity_lines(member, inner))
+        else:
+            lines.append(inner)
+            lines.extend(self.doc_lines(entity.get('doc'), inner))
+        return lines
+
+    def render(self, data):
+        path = data['path']
+        lines = [path, '=' * len(path), '', '.. module:: %s' % path, '']
+        for entity in iter_entities(data.get('entities')):
+            lines.extend(self.entity_lines(entity, ''))
+        return '\n'.join(lines) + '\n'
+
+def page_path(outdir, modpath):
+    return os.path.join(outdir, *(modpath + '.rst').split('/'))
+
+def load_manifest(filename):
+    """
+        Return the module entries of the manifest *filename*, or an empty
+        dict if there is none. The entries of a manifest written by another
+        version have no input hash, so all of their pages are rendered
+        again, but still tell which pages there are.
+    """
+    try:
+        f = codecs.open(filename, 'r', 'utf-8')
+        try:
+            manifest = json.load(f)
+        finally:
+            f.close()
+    except (IOError, OSError, ValueError):
+        return {}
+    modules = manifest.get('modules', {})
+    if manifest.get('version') != RENDER_VERSION:
+        for entry in modules.values():
+            entry['input'] = None
+    return modules
+
+def save_manifest(filename, modules):
+    text = json.dumps({'version': RENDER_VERSION, 'modules': modules},
+                      indent=1, sort_keys=True)
+    write_if_changed(filename, text + '\n')
+
+def scan_file(args):
+    """
+        First pass job: hash the module file *path* and, unless the hash
+        equals *known*, load it and collect the types it declares. Returns
+        ``(path, hash, module path, types)``, the last two being None for
+        known files.
+    """
+    path, known = args
+    f = open(path, 'rb')
+    try:
+        data = f.read()
+    finally:
+        f.close()
+    digest = content_hash(data)
+    if digest == known:
+        return path, digest, None, None
+    module = json.loads(data.decode('utf-8'))
+    return path, digest, module['path'], declared_types(module)
+
+def page_hash(filename):
+    try:
+        f = open(filename, 'rb')
+    except (IOError, OSError):
+        return None
+    try:
+        return content_hash(f.read())
+    finally:
+        f.close()
+
+# the type map, set once per worker process by _init_worker
+_types = None
+
+def _init_worker(types):
+    global _types
+    _types = types
+
+def render_file(path, outdir):
+    """
+        Render the module file *path* into *outdir*. Returns
+        ``(module path, written, page hash, referenced types)``, where the
+        referenced types map each type name the page looked up to the
+        declaration it was resolved to (or None).
+    """
+    data = load_module(path)
+    renderer = ModuleRenderer(_types)
+    text = renderer.render(data)
+    filename = page_path(outdir, data['path'])
+    written = write_if_changed(filename, text)
+    deps = dict((name, _types.get(name)) for name in renderer.used)
+    return (data['path'], written, content_hash(text.encode('utf-8')),
+            deps)
+
+def _render_job(args):
+    return render_file(*args)
+
+def _is_stale(entry, digest, filename, types):
+    if entry is None or entry['input'] != digest:
+        return True
+    if page_hash(filename) != entry['output']:
+        # the page was edited or removed behind our back
+        return True
+    for name, resolved in entry['deps'].items():
+        if types.get(name) != resolved:
+            return True
+    return False
+
+def remove_page(outdir, modpath):
+    """
+        Remove the page of *modpath* from *outdir*, and the package
+        directories it leaves empty.
+    """
+    filename = page_path(outdir, modpath)
+    if os.path.exists(filename):
+        os.remove(filename)
+    dirname = os.path.dirname(filename)
+    while os.path.normpath(dirname) != os.path.normpath(outdir):
+        try:
+            os.rmdir(dirname)
+        except OSError:
+            # not empty
+            break
+        dirname = os.path.dirname(dirname)
+
+def generate(jsondir, outdir, jobs=None, force=False):
+    """
+        Generate the pages for the module files in *jsondir* into *outdir*
+        using *jobs* worker processes (default: one per CPU). Unless
+        *force* is given, modules the manifest knows to be up to date are
+        skipped. The pages of modules whose file is gone are removed.
+        Returns a ``(written, unchanged, removed)`` tuple of module path
+        lists.
+    """
+    manifest_file = os.path.join(outdir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_file)
+    old = not force and manifest or {}
+    byfile = dict((entry['file'], modpath)
+                  for modpath, entry in old.items())
+    files = {}
+    for path in iter_json_files(jsondir):
+        relpath = os.path.relpath(path, jsondir).replace(os.sep, '/')
+        files[path] = relpath
+    jobargs = []
+    for path, relpath in sorted(files.items()):
+        modpath = byfile.get(relpath)
+        jobargs.append((path, modpath and old[modpath]['input']))
+
+    # first pass: hash the inputs, and find out where each type is
+    # declared. Files with a known hash are not even parsed.
+    modules = {}
+    types = {}
+    pool = multiprocessing.Pool(jobs)
+    try:
+        for path, digest, modpath, declared in pool.imap(scan_file, jobargs,
+                                                         16):
+            if modpath is None:
+                modpath = byfile[files[path]]
+                declared = old[modpath]['types']
+            modules[modpath] = (path, digest, declared)
+            for name, role, display in declared:
+                types[name] = [modpath, role, display]
+    finally:
+        pool.close()
+        pool.join()
+
+    stale = []
+    entries = {}
+    for modpath, (path, digest, declared) in sorted(modules.items()):
+        entry = old.get(modpath)
+        if _is_stale(entry, digest, page_path(outdir, modpath), types):
+            stale.append((path, outdir))
+        else:
+            entries[modpath] = entry
+
+    # second pass: render what is stale
+    written = []
+    pool = multiprocessing.Pool(jobs, _init_worker, (types,))
+    try:
+        for modpath, changed, outhash, deps in pool.imap_unordered(
+                _render_job, stale, 16):
+            path, digest, declared = modules[modpath]
+            entries[modpath] = {
+                'file': files[path],
+                'input': digest,
+                'output': outhash,
+                'types': declared,
+                'deps': deps,
+            }
+            if changed:
+                written.append(modpath)
+    finally:
+        pool.close()
+        pool.join()
+
+    # pages of modules that are gone would still be read by Sphinx
+    removed = []
+    for modpath in manifest:
+        if modpath in modules:
+            continue
+        remove_page(outdir, modpath)
+        removed.append(modpath)
+    save_manifest(manifest_file, entries)
+    unchanged = [modpath for modpath in modules if modpath not in written]
+    return sorted(written), sorted(unchanged), sorted(removed)
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog [options] JSONDIR OUTDIR',
+        description='Generate reST pages for the ooc SDK reference from '
+                    'the JSON files written by the compiler.')
+    parser.add_option('-j', '--jobs', type='int', default=None,
+                      help='number of worker processes (default: CPU count)')
+    parser.add_option('-q', '--quiet', action='store_true', default=False,
+                      help='do not list the written pages')
+    parser.add_option('-f', '--force', action='store_true', default=False,
+                      help='ignore the manifest and render every module')
+    options, args = parser.parse_args(argv)
+    if len(args) != 2:
+        parser.error('expected JSONDIR and OUTDIR')
+    written, unchanged, removed = generate(args[0], args[1], options.jobs,
+                                          options.force)
+    if not options.quiet:
+        for modpath in written:
+            print('written: %s' % modpath)
+        for modpath in removed:
+            print('removed: %s' % modpath)
+    print('%d pages written, %d unchanged, %d removed' % (
+        len(written), len(unchanged), len(removed)))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
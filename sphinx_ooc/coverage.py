@@ -0,0 +1,173 @@
+"""
+    Documentation coverage: the compiler's JSON output against the docs.
+
+    Compares the symbols of the JSON files the compiler writes (see
+    ``source/compilers/json.rst``) with the API export of the built docs
+    (see :mod:`sphinx_ooc.apiformat`) and reports each symbol that is
+
+    * ``missing``: in the compiler output, but not documented;
+    * ``stale``: documented with another signature (kind, parameters or
+      return type) than the compiler output has;
+    * ``extra``: documented, but not in the compiler output any more.
+
+    A symbol is identified by ``(module, class, name, suffix)``; its
+    signature is compared by hash, with the types reduced to their names
+    (``lang/types Char*`` and ``pointer(Char)`` both are ``Char*``). The
+    documented symbols are hashed first, then the JSON files are read one
+    at a time and each of their symbols is looked up once, so the time is
+    linear in the number of symbols, only one JSON file is in memory at
+    any time, and ``missing`` and ``stale`` lines are written as the files
+    are read. Documented symbols outside of any module (like the examples
+    in the language reference) are not compared.
+
+    Usage: python -m sphinx_ooc.coverage [-q] JSONDIR APIEXPORT
+"""
+import hashlib
+import optparse
+import os
+import re
+import sys
+
+from sphinx_ooc.apiformat import BINARY_NAME, open_api
+from sphinx_ooc.apigen import MEMBER_DIRECTIVES, ModuleRenderer, \
+    iter_json_files, load_module, iter_entities
+from sphinx_ooc.symbols import symbol_key, plain_signature
+
+module_prefix_re = re.compile(r'[\w/]+ +(?=\w)')
+
+def type_name(text):
+    """
+        Return the type *text* (``structs/List List<T>*``, ``List *``)
+        reduced to its names and modifiers (``List*``).
+    """
+    return ''.join(module_prefix_re.sub('', symbol_key(text)).split())
+
+def signature_hash(kind, params, returns):
+    """
+        Return the hash of a signature: the object type, the ``(name,
+        type)`` pairs of the parameters and the return type. The name of
+        a parameter without a type is its type (``execv (String, String*)``)
+        and compared like one.
+    """
+    text = '\n'.join([kind, type_name(returns)] +
+                     ['%s: %s' % (typename and name or type_name(name),
+                                  type_name(typename))
+                      for name, typename in params])
+    return hashlib.sha1(text.encode('utf-8')).digest()[:8]
+
+def split_member(member):
+    """
+        Return ``(name, suffix)`` for a member name like ``new~withMode``.
+    """
+    name, tilde, suffix = member.partition('~')
+    return name, suffix
+
+def documented_symbols(api):
+    """
+        Return a dict mapping the identity ``(module, class, name, suffix)``
+        of each documented symbol in the API export reader *api* to ``(hash
+        of its signature, symbol key)``.
+    """
+    symbols = {}
+    for symbol in api:
+        if not symbol.module:
+            continue
+        path = symbol.key[len(symbol.module) + 1:]
+        classname, space, member = path.rpartition(' ')
+        identity = (symbol.module, classname) + split_member(member)
+        symbols[identity] = (signature_hash(symbol.kind, symbol.params,
+                                            symbol.returns), symbol.key)
+    return symbols
+
+def _entity_kind(entity):
+    kind = MEMBER_DIRECTIVES[entity['type']]
+    if kind == 'method' and 'static' in (entity.get('modifiers') or ()):
+        return 'staticmethod'
+    return kind
+
+def compiled_symbols(data, renderer):
+    """
+        Yield ``(identity, hash of the signature, signature)`` for each
+        symbol of the module *data*, as :func:`documented_symbols` names
+        them.
+    """
+    module = data['path']
+    entities = [('', entity)
+                for entity in iter_entities(data.get('entities'))]
+    # class members are appended while iterating
+    for classname, entity in entities:
+        if entity.get('type') not in MEMBER_DIRECTIVES:
+            continue
+        kind = _entity_kind(entity)
+        if kind in ('class', 'cover'):
+            entities.extend((entity['name'], member) for member
+                            in iter_entities(entity.get('members')))
+            yield ((module, classname, entity['name'], ''),
+                   signature_hash(kind, (), ''), entity['name'])
+            continue
+        params = []
+        for arg in entity.get('arguments') or ():
+            if arg[0] and arg[0] != '...':
+                params.append((arg[0], renderer.type_text(arg[1])))
+            else:
+                params.append((arg[0] or renderer.type_text(arg[1]), ''))
+        returns = entity.get('returnType') or entity.get('varType')
+        returns = returns and renderer.type_text(returns) or ''
+        yield ((module, classname) + split_member(entity['name']),
+               signature_hash(kind, params, returns),
+               plain_signature(renderer.signature(entity)))
+
+def compare(jsondir, api):
+    """
+        Compare the JSON files in *jsondir* with the API export reader
+        *api*. Yields ``(status, name, detail)`` for each difference,
+        *status* being ``'missing'``, ``'stale'`` or ``'extra'``.
+    """
+    documented = documented_symbols(api)
+    renderer = ModuleRenderer({})
+    for path in iter_json_files(jsondir):
+        data = load_module(path)
+        for identity, digest, signature in compiled_symbols(data, renderer):
+            name = ' '.join([part for part in identity[:2] if part] +
+                            ['~'.join([part for part in identity[2:]
+                                       if part])])
+            entry = documented.pop(identity, None)
+            if entry is None:
+                yield 'missing', name, signature
+            elif entry[0] != digest:
+                yield 'stale', name, 'documented as %s, compiled as %s' % (
+                    api.find(entry[1]).signature, signature)
+    for identity in sorted(documented):
+        yield 'extra', documented[identity][1], ''
+
+def main(argv):
+    parser = optparse.OptionParser(
+        usage='%prog [options] JSONDIR APIEXPORT',
+        description='Compare the symbols in the JSON files written by the '
+                    'compiler with the ooc API export of the docs (the '
+                    'output directory of the oocapi builder or a file in '
+                    'it).')
+    parser.add_option('-q', '--quiet', action='store_true', default=False,
+                      help='only print the summary')
+    options, args = parser.parse_args(argv[1:])
+    if len(args) != 2:
+        parser.error('expected JSONDIR and APIEXPORT')
+    filename = args[1]
+    if os.path.isdir(filename):
+        filename = os.path.join(filename, BINARY_NAME)
+    api = open_api(filename)
+    counts = {'missing': 0, 'stale': 0, 'extra': 0}
+    try:
+        for status, name, detail in compare(args[0], api):
+            counts[status] += 1
+            if not options.quiet:
+                sys.stdout.write('%-8s %s%s\n' % (status, name,
+                                                  detail and ': ' + detail))
+    finally:
+        api.close()
+    sys.stdout.write('%(missing)d missing, %(stale)d stale, %(extra)d extra\n'
+                     % counts)
+    return any(counts.values()) and 1 or 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,132 @@
+"""
+    Dependencies between pages through ooc cross-references.
+
+    When a page is read again, Sphinx rewrites only that page, though
+    references on other pages to the symbols it declares (or declared
+    before) may now resolve to another target, or not at all. The domain
+    records the ooc references of every page; before reading, the symbol
+    table is set aside, and once all changed pages are read, the references
+    of the other pages to symbols with the short name of a symbol declared
+    on a changed or removed page are resolved against the old and the new
+    table. The pages where a resolution differs are written again, without
+    being read. Nothing else is rewritten, so editing the SDK pages one at
+    a time (see :mod:`sphinx_ooc.watch`) stays cheap.
+"""
+from sphinx.util import logging
+
+from sphinx_ooc.symbols import symbol_key, short_name, find_symbol
+
+logger = logging.getLogger(__name__)
+
+def snapshot(data):
+    """
+        Return a copy of the symbol table in the ooc domain *data*, as far
+        as the resolution of references is concerned.
+    """
+    return {
+        'objects': dict(data['objects']),
+        'shortnames': dict((name, list(keys))
+                           for name, keys in data['shortnames'].items()),
+        'modules': dict(data['modules']),
+        'docobjects': dict(data['docobjects']),
+    }
+
+def xref_name(xref):
+    """
+        Return the name the resolution of *xref* (see
+        :meth:`OOCDomain.process_doc`) depends on: the short name of its
+        target, or ``('mod', modname)`` for module references.
+    """
+    if xref[0] == 'mod':
+        return ('mod', xref[3])
+    return short_name(symbol_key(xref[3]))
+
+def declared_names(docobjects, modules, docnames):
+    """
+        Return the names (see :func:`xref_name`) of the symbols and modules
+        declared on the pages *docnames*, given the ``docobjects`` and
+        ``modules`` of the domain data.
+    """
+    names = set()
+    for docname in docnames:
+        for key in docobjects.get(docname, ()):
+            names.add(short_name(key))
+    for modname, entry in modules.items():
+        if entry[0] in docnames:
+            names.add(('mod', modname))
+    return names
+
+def referrers(xrefs, names):
+    """
+        Return the reverse dependency graph of the references *xrefs*
+        (docname -> references) for *names*: name -> ``[(docname, xref),
+        ...]``.
+    """
+    graph = {}
+    for docname, docxrefs in xrefs.items():
+        for xref in docxrefs:
+            name = xref_name(xref)
+            if name in names:
+                graph.setdefault(name, []).append((docname, xref))
+    return graph
+
+def resolve(domain, data, xref):
+    """
+        Return what *xref* resolves to with the symbol table *data* (the
+        domain data or a :func:`snapshot` of it), as a comparable value.
+    """
+    role, modname, classname, target, refspecific = xref
+    if role == 'mod':
+        entry = data['modules'].get(target)
+        return entry and entry[0]
+    matches = find_symbol(data['objects'], data['shortnames'], modname,
+                          classname, target, domain.objtypes_for_role(role),
+                          refspecific and 1 or 0)
+    return tuple((entry[0], entry[2]) for key, entry in matches)
+
+def snapshot_symbols(app, env, added, changed, removed):
+    """
+        Set the symbol table aside before anything is read or removed;
+        connected to ``env-get-outdated``.
+    """
+    app.ooc_symbol_snapshot = snapshot(env.get_domain('ooc').data)
+    app.ooc_removed_docs = set(removed)
+    return []
+
+def note_read_docs(app, env, docnames):
+    # connected to env-before-read-docs, which has the final list
+    app.ooc_read_docs = set(docnames)
+
+def changed_referrers(app, env):
+    """
+        Return the pages that were not read but whose ooc references
+        resolve differently now; connected to ``env-updated``.
+    """
+    old = getattr(app, 'ooc_symbol_snapshot', None)
+    if old is None:
+        return []
+    app.ooc_symbol_snapshot = None
+    read = app.ooc_read_docs
+    changed = read | app.ooc_removed_docs
+    if not changed:
+        return []
+    domain = env.get_domain('ooc')
+    data = domain.data
+    names = declared_names(old['docobjects'], old['modules'], changed)
+    names |= declared_names(data['docobjects'], data['modules'], read)
+    docnames = set()
+    for name, references in referrers(data['xrefs'], names).items():
+        for docname, xref in references:
+            if docname in read or docname in docnames:
+                continue
+            if resolve(domain, old, xref) != resolve(domain, data, xref):
+                docnames.add(docname)
+    if docnames:
+        logger.info('%d pages with changed ooc references: %s',
+                    len(docnames), ', '.join(sorted(docnames)))
+    return sorted(docnames)
+
+def setup_dependencies(app):
+    app.connect('env-get-outdated', snapshot_symbols)
+    app.connect('env-before-read-docs', note_read_docs)
+    app.connect('env-updated', changed_referrers)
@@ -1,31 +1,189 @@
 import re
 
 from docutils import nodes
-from docutils.parsers.rst import directives, roles
+from docutils.parsers.rst import Directive, directives
+from docutils.statemachine import StringList
 
 from sphinx import addnodes
-from sphinx.roles import xfileref_role
-from sphinx.directives import DescDirective
-from sphinx.util.compat import Directive, directive_dwim
-
-ooc_sig_re = re.compile(
-    r'''^ ([\w<>/,]*[ /])?            # class name(s)
-          ([\w<>~,]+)  \s*             # thing name
-          (?: \((.*)\))?           # optional: arguments
-          (?:\s* -> \s* (.*))?  #           return annotation
-          $                   # and nothing more
-          ''', re.VERBOSE)
-ooc_paramlist_re = re.compile(r'([\[\],])')  # split at '[', ']' and ','
-
-class OOCDesc(DescDirective):
+from sphinx.directives import ObjectDescription
+from sphinx.locale import _
+from sphinx.util import logging
+from sphinx.util.docfields import Field, TypedField
+
+from sphinx_ooc.instrument import profiled
+from sphinx_ooc.sigcache import rendered_signatures
+from sphinx_ooc.signature import parse_signature, SignatureError
+from sphinx_ooc.symbols import MEMBER_OBJTYPES, qualify_name
+from sphinx_ooc.typeexpr import Modified, FuncType, parse_type, split_param, \
+    typed_params, intern_string
+
+logger = logging.getLogger(__name__)
+
+# inline markup of type annotations, by annotation text or type expression
+# (see sphinx_ooc.typeexpr). Only holds results whose nodes have no
+# document-level side effects (targets, footnotes, named references), so a
+# deep copy can stand in for a re-parse.
+_typeref_cache = {}
+_typeref_cacheable = (nodes.Text, nodes.inline, nodes.literal,
+                      nodes.emphasis, nodes.strong, addnodes.pending_xref)
+
+def clear_typeref_cache(app=None):
+    """
+        Forget all cached type annotations; connected to ``builder-inited``
+        so the cache never outlives a build.
+    """
+    _typeref_cache.clear()
+
+def _is_cacheable(result):
+    for node in result:
+        for subnode in node.traverse():
+            if not isinstance(subnode, _typeref_cacheable):
+                return False
+            if not isinstance(subnode, nodes.Text) and \
+                    (subnode['ids'] or subnode['names'] or
+                     subnode.get('refname')):
+                return False
+    return True
+
+def _detached_copy(template):
+    """
+        Return a deep copy of the nodes *template* that does not refer to
+        their document (which would be pickled along) or source location
+        (the copies made from it take the location of their parent).
+    """
+    result = [node.deepcopy() for node in template]
+    for node in result:
+        for subnode in node.traverse():
+            subnode.source = subnode.line = None
+            if '_document' in subnode.__dict__:
+                subnode._document = None
+            elif 'document' in subnode.__dict__:
+                subnode.document = None
+    return result
+
+# javadoc style tags of the doc comments the SDK pages are generated from
+doc_tag_re = re.compile(r'^(\s*)@(param|return|returns|access)(?:\s+|$)(.*)$')
+
+def signature_params(sigs):
+    """
+        Return the parameters of the signatures *sigs* as a dict of name ->
+        annotation (None for parameters without one; see
+        :func:`~sphinx_ooc.typeexpr.typed_params`).
+    """
+    params = {}
+    for sig in sigs:
+        try:
+            parsed = parse_signature(sig)
+        except SignatureError:
+            continue
+        for name, annotation in typed_params(parsed.params):
+            if annotation is None:
+                params.setdefault(name, None)
+            else:
+                params[name] = annotation
+    return params
+
+def doc_fields(content, params):
+    """
+        Turn the ``@param``, ``@return`` and ``@access`` tags in the lines
+        of *content* (a ``StringList``) into a field list, in a single
+        pass. A tag runs up to the next tag or blank line. A parameter may
+        be given with its type first (``@param UInt capacity ...``); its
+        type is taken from *params* (see :func:`signature_params`) instead.
+        The content of nested directives (the members of a class) is left
+        alone; it is the business of those directives. Returns ``(new
+        content, access)``, *access* being the value of the ``@access`` tag
+        or None.
+    """
+    result = StringList()
+    access = None
+    indent = None   # of the field list being written
+    nested = None   # indentation of the nested directive being skipped
+    for i, line in enumerate(content):
+        source, offset = content.items[i]
+        stripped = line.lstrip()
+        if nested is not None:
+            if not stripped or len(line) - len(stripped) > nested:
+                result.append(line, source, offset)
+                continue
+            nested = None
+        if stripped.startswith('.. '):
+            nested = len(line) - len(stripped)
+            if indent is not None:
+                # end the field list
+                result.append('', source, offset)
+                indent = None
+            result.append(line, source, offset)
+            continue
+        m = doc_tag_re.match(line)
+        if m is None:
+            if indent is not None:
+                if line.strip():
+                    # continuation of the last tag
+                    result.append(indent + '   ' + line.strip(), source,
+                                  offset)
+                    continue
+                indent = None
+            result.append(line, source, offset)
+            continue
+        tag_indent, tag, text = m.groups()
+        if indent is None:
+            indent = tag_indent
+            if len(result) and result[-1].strip():
+                # a field list has to start a new body element
+                result.append('', source, offset)
+        if tag == 'param':
+            words = text.split(None, 1)
+            if len(words) == 2 and words[0] not in params:
+                # @param Type name text
+                rest = words[1].split(None, 1)
+                if rest[0] in params:
+                    words = rest
+            if not words:
+                continue
+            name = words[0]
+            result.append('%s:param %s: %s' % (
+                indent, name, words[1:] and words[1] or ''), source, offset)
+            if params.get(name):
+                result.append('%s:type %s: %s' % (indent, name,
+                                                  params[name]),
+                              source, offset)
+        elif tag == 'access':
+            access = text.strip()
+            result.append('%s:access: %s' % (indent, access), source, offset)
+        else:
+            result.append('%s:returns: %s' % (indent, text), source, offset)
+    return result, access
+
+class OOCDesc(ObjectDescription):
     """
         Description of a ooc object.
     """
-#    doc_fields_without_arg = DescDirective.doc_fields_without_arg.copy()
-#    doc_fields_without_arg.update({
-#        'extends': 'extends',
-#        'from': 'from',
-#    })
+    option_spec = {
+        'noindex': directives.flag,
+        'module': directives.unchanged,
+    }
+
+    doc_field_types = [
+        Field('extends', label=_('Extends'), has_arg=False),
+        Field('from', label=_('From'), has_arg=False),
+        TypedField('parameter', label=_('Parameters'),
+                   names=('param', 'parameter'), typenames=('type',),
+                   can_collapse=True),
+        Field('returnvalue', label=_('Returns'), has_arg=False,
+              names=('returns', 'return')),
+        Field('access', label=_('Access'), has_arg=False),
+    ]
+
+    def run(self):
+        if self.content:
+            env = self.state.document.settings.env
+            self.content, access = doc_fields(
+                self.content, signature_params(self.get_signatures()))
+            if access == 'private' and env.config.ooc_hide_private:
+                # never parsed, never registered
+                return []
+        return ObjectDescription.run(self)
 
     def get_signature_prefix(self, sig):
         return ''
@@ -33,35 +191,139 @@ class OOCDesc(DescDirective):
     def needs_arglist(self):
         return False
 
-    def _resolve_typeref(self, text):
-        return self.state.inline_text(text, self.lineno)[0]
-
-    def parse_signature(self, sig, signode):
+    def _resolve_typeref(self, text, param=False):
         """
-            Returns (fully qualified name, classname if any).
+            Return the nodes for the annotation *text*, or for the parameter
+            *text* (like ``key: K``) if *param* is true.
         """
-        m = ooc_sig_re.match(sig)
-        if m is None:
-            raise ValueError
-        classname, name, arglist, retann = m.groups()
-        if self.env.currclass:
-            add_module = False
-            if classname and classname.startswith(self.env.currclass):
-                # classname is repeated in the signature
-                classname = classname[len(self.env.currclass):].lstrip('/')
-            elif classname:
-                # class name given in the signature, but different,
-                # should not happen
-                fullname = self.env.currclass + '/' + classname + name
-            else:
-                # not given
-                if isinstance(self, ClassmemberDesc):
-                    fullname = self.env.currclass + ' ' + name
-                else:
-                    fullname = self.env.currclass + '/' + name
+        with profiled(self.env, 'resolve_typeref'):
+            names, annotation = '', text
+            if param:
+                names, annotation = split_param(text) or ('', text)
+            expr = parse_type(annotation)
+            if expr:
+                result = self._type_nodes(expr)
+                if result is not None:
+                    return names and [nodes.Text(names)] + result or result
+            return self._resolve_typeref_nodes(text)
+
+    def _type_nodes(self, expr):
+        """
+            Build the nodes for the type expression *expr*: references for
+            the named types, text for the rest. Returns None if a role
+            reports a problem.
+        """
+        if isinstance(expr, Modified):
+            modifiers = ''
+            while isinstance(expr, Modified):
+                modifiers = expr.modifier + modifiers
+                expr = expr.base
+            result = self._type_nodes(expr)
+            return result and result + [nodes.Text(modifiers)]
+        if isinstance(expr, FuncType):
+            result = [nodes.Text('Func')]
+            if expr.args is not None:
+                result += self._type_list_nodes(' (', expr.args, ', ', ')')
+            if expr.retann is not None:
+                result.append(nodes.Text(' -> '))
+                result += self._type_nodes(expr.retann) or [None]
+            return None not in result and result or None
+        if expr.role is None:
+            if expr.args is None:
+                return [nodes.Text(expr.text)]
+            result = self._type_list_nodes(expr.name + '<', expr.args, ',',
+                                           '>')
+            return None not in result and result or None
+        template = _typeref_cache.get(expr)
+        if template is not None:
+            return self._copy_typeref(template)
+        role = self.env.get_domain('ooc').roles[expr.role]
+        result, messages = role('ooc:' + expr.role,
+                                intern_string(':%s:`%s`' % (expr.role,
+                                                            expr.target)),
+                                expr.target, self.lineno, self.state.inliner)
+        if messages:
+            self._cacheable = False
+            return None
+        # share the strings of the target among all references to it
+        for node in result:
+            for xref in node.traverse(addnodes.pending_xref):
+                xref['reftarget'] = intern_string(xref['reftarget'])
+        if _is_cacheable(result):
+            _typeref_cache[expr] = [node.deepcopy() for node in result]
         else:
-            add_module = True
-            fullname = classname and classname + name or name
+            self._cacheable = False
+        return result
+
+    def _type_list_nodes(self, start, exprs, separator, end):
+        result = [nodes.Text(start)]
+        for i, expr in enumerate(exprs):
+            if i:
+                result.append(nodes.Text(separator))
+            result += self._type_nodes(expr) or [None]
+        result.append(nodes.Text(end))
+        return result
+
+    def _resolve_typeref_nodes(self, text):
+        try:
+            template = _typeref_cache[text]
+        except KeyError:
+            result, messages = self.state.inline_text(text, self.lineno)
+            if not messages and _is_cacheable(result):
+                _typeref_cache[text] = [node.deepcopy() for node in result]
+            else:
+                self._cacheable = False
+            return result
+        return self._copy_typeref(template)
+
+    def _copy_typeref(self, template):
+        result = [node.deepcopy() for node in template]
+        # the roles recorded the context of the first use
+        for node in result:
+            for xref in node.traverse(addnodes.pending_xref):
+                xref['ooc:module'] = self.env.ref_context.get('ooc:module')
+                xref['ooc:class'] = self.env.ref_context.get('ooc:class')
+                if 'refdoc' in xref:
+                    xref['refdoc'] = self.env.docname
+                xref.line = self.lineno
+        return result
+
+    def handle_signature(self, sig, signode):
+        """
+            Returns (fully qualified name, classname if any).
+        """
+        with profiled(self.env, 'handle_signature', sig):
+            key = (sig, self.objtype,
+                   self.options.get('module',
+                                    self.env.ref_context.get('ooc:module')),
+                   self.env.ref_context.get('ooc:class'))
+            cached = rendered_signatures.get(key)
+            if cached is not None:
+                fullname, classname, template = cached
+                signode.extend(self._copy_typeref(template))
+                return fullname, classname
+            self._cacheable = True
+            result = self._handle_signature(sig, signode)
+            if self._cacheable:
+                rendered_signatures.set(key, result + (
+                    _detached_copy(signode.children),))
+            return result
+
+    def _handle_signature(self, sig, signode):
+        try:
+            with profiled(self.env, 'parse_signature'):
+                parsed = parse_signature(sig)
+        except SignatureError as err:
+            # ObjectDescription falls back to the plain signature text, but
+            # the reason should not get lost
+            logger.warning(str(err), location=(self.env.docname, self.lineno))
+            raise
+        classname, name = parsed.classname, parsed.name
+        retann = parsed.retann
+        currclass = self.env.ref_context.get('ooc:class')
+        add_module = not currclass
+        fullname, classname = qualify_name(classname, name, currclass,
+                                           self.objtype in MEMBER_OBJTYPES)
 
         prefix = self.get_signature_prefix(sig)
         if prefix:
@@ -72,48 +334,30 @@ class OOCDesc(DescDirective):
         # exceptions are a special case, since they are documented in the
         # 'exceptions' module.
         elif add_module and self.env.config.add_module_names:
-            modname = self.options.get('module', self.env.currmodule)
+            modname = self.options.get('module',
+                                       self.env.ref_context.get('ooc:module'))
             if modname and modname != 'exceptions':
                 nodetext = modname + '/'
                 # signode += addnodes.desc_addname(nodetext, nodetext)
 
         signode += addnodes.desc_name(name, name)
-        if not arglist:
+        if not parsed.arglist:
             if self.needs_arglist():
                 # for callables, add an empty parameter list
                 signode += addnodes.desc_parameterlist()
             if retann:
                 signode += addnodes.desc_returns('', '', *self._resolve_typeref(retann))
             return fullname, classname
-        signode += addnodes.desc_parameterlist()
-
-        stack = [signode[-1]]
-        token_before = None
-        for token in ooc_paramlist_re.split(arglist):
-            if token_before is not None:
-                if token == ',':
-                    # add commas yay.
-                    token_before += token
-                    continue
-                else:
-                    token = token_before + token
-                    print 'NOW TOKEN: %r' % token
-                    token_before = None
-            if token.count('<') != token.count('>'):
-                # splitted in the middle of a <A, B, C> declaration :(
-                token_before = token
-            elif not token or token == ',' or token.isspace():
-                pass
+        paramlist = addnodes.desc_parameterlist()
+        signode += paramlist
+
+        for token in parsed.params:
+            if ':' in token:
+                paramlist += addnodes.desc_parameter(
+                    '', '', *self._resolve_typeref(token, param=True))
             else:
-                token = token.strip()
-                if ':' in token:
-                    stack[-1] += addnodes.desc_parameter('', '', *self._resolve_typeref(token))
-                else:
-                    stack[-1] += addnodes.desc_parameter(token, token)
-        if len(stack) != 1:
-            raise ValueError
+                paramlist += addnodes.desc_parameter(token, token)
         if retann:
-            ret_nodes = self.state.inline_text(retann, self.lineno)[0]
             signode += addnodes.desc_returns('', '', *self._resolve_typeref(retann))
         return fullname, classname
 
@@ -124,19 +368,26 @@ class OOCDesc(DescDirective):
         raise NotImplementedError('must be implemented in subclasses')
 
     def add_target_and_index(self, name_cls, sig, signode):
-        modname = self.options.get('module', self.env.currmodule)
-        fullname = (modname and modname + ' ' or '') + name_cls[0]
+        with profiled(self.env, 'add_target_and_index'):
+            self._add_target_and_index(name_cls, sig, signode)
+
+    def _add_target_and_index(self, name_cls, sig, signode):
+        modname = self.options.get('module',
+                                   self.env.ref_context.get('ooc:module'))
+        fullname = intern_string((modname and modname + ' ' or '') +
+                                 name_cls[0])
         # note target
         if fullname not in self.state.document.ids:
             signode['names'].append(fullname)
             signode['ids'].append(fullname)
             signode['first'] = (not self.names)
             self.state.document.note_explicit_target(signode)
-            self.env.note_descref(fullname, self.desctype, self.lineno)
+            self.env.get_domain('ooc').note_object(fullname, self.objtype,
+                                                   self.lineno, sig)
         indextext = self.get_index_text(modname, name_cls)
         if indextext:
             self.indexnode['entries'].append(('single', indextext,
-                                              fullname, fullname))
+                                              fullname, '', None))
 
     def before_content(self):
         # needed for automatic qualification of members (reset in subclasses)
@@ -144,7 +395,7 @@ class OOCDesc(DescDirective):
 
     def after_content(self):
         if self.clsname_set:
-            self.env.currclass = None
+            self.env.ref_context.pop('ooc:class', None)
 
 class ModulelevelDesc(OOCDesc):
     """
@@ -152,14 +403,14 @@ class ModulelevelDesc(OOCDesc):
     """
 
     def needs_arglist(self):
-        return self.desctype == 'function'
+        return self.objtype == 'function'
 
     def get_index_text(self, modname, name_cls):
-        if self.desctype == 'function':
+        if self.objtype == 'function':
             if not modname:
                 return _('%s() (built-in function)') % name_cls[0]
             return _('%s() (in module %s)') % (name_cls[0], modname)
-        elif self.desctype == 'var':
+        elif self.objtype == 'var':
             if not modname:
                 return _('%s (built-in variable)') % name_cls[0]
             return _('%s (in module %s)') % (name_cls[0], modname)
@@ -172,14 +423,14 @@ class ClasslikeDesc(OOCDesc):
     """
 
     def get_signature_prefix(self, sig):
-        return self.desctype + ' '
+        return self.objtype + ' '
 
     def get_index_text(self, modname, name_cls):
-        if self.desctype == 'class':
+        if self.objtype == 'class':
             return _('%s (class in %s)') % (name_cls[0], modname)
-        elif self.desctype == 'cover':
+        elif self.objtype == 'cover':
             return _('%s (cover in %s)') % (name_cls[0], modname)
-        elif self.desctype == 'exception':
+        elif self.objtype == 'exception':
             return name_cls[0]
         else:
             return ''
@@ -187,7 +438,7 @@ class ClasslikeDesc(OOCDesc):
     def before_content(self):
         OOCDesc.before_content(self)
         if self.names:
-            self.env.currclass = self.names[0][0]
+            self.env.ref_context['ooc:class'] = self.names[0][0]
             self.clsname_set = True
 
 class ClassmemberDesc(OOCDesc):
@@ -196,19 +447,19 @@ class ClassmemberDesc(OOCDesc):
     """
 
     def needs_arglist(self):
-        return self.desctype.endswith('function')
+        return self.objtype.endswith('function')
 
     def get_signature_prefix(self, sig):
-        if self.desctype == 'staticmethod':
+        if self.objtype == 'staticmethod':
             return 'static method '
-        elif self.desctype == 'method':
+        elif self.objtype == 'method':
             return 'method '
         return ''
 
     def get_index_text(self, modname, name_cls):
         name, cls = name_cls
         add_modules = self.env.config.add_module_names
-        if self.desctype == 'method':
+        if self.objtype == 'method':
             try:
                 clsname, methname = name.rsplit(' ', 1)
             except ValueError:
@@ -220,7 +471,7 @@ class ClassmemberDesc(OOCDesc):
                 return _('%s() (%s/%s method)') % (methname, modname, clsname)
             else:
                 return _('%s() (%s method)') % (methname, clsname)
-        elif self.desctype == 'staticmethod':
+        elif self.objtype == 'staticmethod':
             try:
                 clsname, methname = name.rsplit(' ', 1)
             except ValueError:
@@ -233,7 +484,7 @@ class ClassmemberDesc(OOCDesc):
                                                           clsname)
             else:
                 return _('%s() (%s static method)') % (methname, clsname)
-        elif self.desctype == 'field':
+        elif self.objtype == 'field':
             try:
                 clsname, attrname = name.rsplit(' ', 1)
             except ValueError:
@@ -250,20 +501,64 @@ class ClassmemberDesc(OOCDesc):
 
     def before_content(self):
         OOCDesc.before_content(self)
-        if self.names and self.names[-1][1] and not self.env.currclass:
-            self.env.currclass = self.names[-1][1].strip('/ ')
+        if self.names and self.names[-1][1] and \
+                not self.env.ref_context.get('ooc:class'):
+            self.env.ref_context['ooc:class'] = self.names[-1][1].strip('/ ')
             self.clsname_set = True
 
+class ModuleDesc(Directive):
+    """
+    Directive to mark description of a new module.
+    """
 
-directives.register_directive('describe', directive_dwim(DescDirective))
-
-directives.register_directive('function', directive_dwim(ModulelevelDesc))
-directives.register_directive('var', directive_dwim(ModulelevelDesc))
-directives.register_directive('class', directive_dwim(ClasslikeDesc))
-directives.register_directive('cover', directive_dwim(ClasslikeDesc))
-
-directives.register_directive('method', directive_dwim(ClassmemberDesc))
-directives.register_directive('staticmethod', directive_dwim(ClassmemberDesc))
-directives.register_directive('field', directive_dwim(ClassmemberDesc))
-
+    has_content = False
+    required_arguments = 1
+    optional_arguments = 0
+    final_argument_whitespace = False
+    option_spec = {
+        'platform': directives.unchanged,
+        'synopsis': directives.unchanged,
+        'noindex': directives.flag,
+        'deprecated': directives.flag,
+    }
+
+    def run(self):
+        env = self.state.document.settings.env
+        modname = self.arguments[0].strip()
+        env.ref_context['ooc:module'] = modname
+        env.ref_context.pop('ooc:class', None)
+        if 'noindex' in self.options:
+            return []
+        env.get_domain('ooc').note_module(modname,
+                                          self.options.get('synopsis', ''),
+                                          self.options.get('platform', ''),
+                                          'deprecated' in self.options)
+        targetnode = nodes.target('', '', ids=['module-' + modname],
+                                  ismod=True)
+        self.state.document.note_explicit_target(targetnode)
+        indextext = _('%s (module)') % modname
+        inode = addnodes.index(entries=[('single', indextext,
+                                         'module-' + modname, '', None)])
+        return [targetnode, inode]
+
+class CurrentModule(Directive):
+    """
+    This directive is just to tell Sphinx that we're documenting
+    stuff in module foo, but links to module foo won't lead here.
+    """
 
+    has_content = False
+    required_arguments = 1
+    optional_arguments = 0
+    final_argument_whitespace = False
+    option_spec = {}
+
+    def run(self):
+        env = self.state.document.settings.env
+        modname = self.arguments[0].strip()
+        if modname == 'None':
+            env.ref_context.pop('ooc:module', None)
+        else:
+            env.ref_context['ooc:module'] = modname
+        env.ref_context.pop('ooc:class', None)
+        return []
@@ -0,0 +1,353 @@
+"""
+    The ooc domain.
+
+    Every documented object is recorded under its symbol key, the space
+    separated ``module class member`` path with generic arguments dropped
+    (see :mod:`sphinx_ooc.symbols`), plus a reverse index from
+    the last path component to the keys ending in it. Resolving a reference
+    is then a handful of dictionary lookups, however big the SDK gets.
+
+    Once everything is read, the references are resolved in batches, a
+    document at a time, before Sphinx's own resolver runs: through a
+    :class:`~sphinx_ooc.symbols.SymbolIndex` built once per build, which
+    adds a suffix index for the ``.name`` searches and caches every
+    distinct lookup.
+
+    The symbol table holds names, not types. The keys, object types and
+    anchors are strings interned with
+    :func:`~sphinx_ooc.typeexpr.intern_string`, so they share one copy with
+    the names in the type expressions and are pickled once, and the
+    signatures are kept as written. References to the
+    :class:`~sphinx_ooc.typeexpr.TypeExpr` trees would not make the table
+    any smaller, as a name is the same string either way. They would tie
+    the pickled environment to those classes, and the readers of the table
+    (the search index and the API export) would have to render them back
+    to text.
+"""
+from sphinx import addnodes
+from sphinx.domains import Domain, ObjType, Index
+from sphinx.locale import _
+from sphinx.transforms.post_transforms import SphinxPostTransform
+from sphinx.util import logging
+from sphinx.util.nodes import make_refnode
+
+try:
+    from sphinx.errors import NoUri
+except ImportError:
+    from sphinx.environment import NoUri
+
+from sphinx_ooc.desc import ModulelevelDesc, ClasslikeDesc, ClassmemberDesc, \
+    ModuleDesc, CurrentModule
+from sphinx_ooc.roles import XOOCRefRole
+from sphinx_ooc.symbols import OBJTYPE_ROLES, symbol_key, short_name, \
+    SymbolIndex
+from sphinx_ooc.typeexpr import intern_string
+
+logger = logging.getLogger(__name__)
+
+class OOCModuleIndex(Index):
+    """
+    Index of all documented ooc modules, grouped by package.
+    """
+
+    name = 'modindex'
+    localname = _('ooc Module Index')
+    shortname = _('modules')
+
+    def generate(self, docnames=None):
+        content = {}
+        modules = sorted(self.domain.data['modules'].items())
+        for modname, (docname, synopsis, platform, deprecated) in modules:
+            if docnames and docname not in docnames:
+                continue
+            package = modname.split('/', 1)[0]
+            entries = content.setdefault(package, [])
+            qualifier = deprecated and _('Deprecated') or ''
+            entries.append([modname, 0, docname, 'module-' + modname,
+                            platform, qualifier, synopsis])
+        return sorted(content.items()), False
+
+class OOCDomain(Domain):
+    """ooc language domain."""
+    name = 'ooc'
+    label = 'ooc'
+    object_types = {
+        'function':     ObjType(_('function'), *OBJTYPE_ROLES['function']),
+        'var':          ObjType(_('variable'), *OBJTYPE_ROLES['var']),
+        'class':        ObjType(_('class'), *OBJTYPE_ROLES['class']),
+        'cover':        ObjType(_('cover'), *OBJTYPE_ROLES['cover']),
+        'method':       ObjType(_('method'), *OBJTYPE_ROLES['method']),
+        'staticmethod': ObjType(_('static method'),
+                                *OBJTYPE_ROLES['staticmethod']),
+        'field':        ObjType(_('field'), *OBJTYPE_ROLES['field']),
+        'module':       ObjType(_('module'), *OBJTYPE_ROLES['module']),
+    }
+
+    directives = {
+        'function':      ModulelevelDesc,
+        'var':           ModulelevelDesc,
+        'class':         ClasslikeDesc,
+        'cover':         ClasslikeDesc,
+        'method':        ClassmemberDesc,
+        'staticmethod':  ClassmemberDesc,
+        'field':         ClassmemberDesc,
+        'module':        ModuleDesc,
+        'currentmodule': CurrentModule,
+    }
+    roles = {
+        'func':  XOOCRefRole(fix_parens=True),
+        'var':   XOOCRefRole(),
+        'class': XOOCRefRole(),
+        'cover': XOOCRefRole(),
+        'meth':  XOOCRefRole(fix_parens=True),
+        'field': XOOCRefRole(),
+        'mod':   XOOCRefRole(),
+    }
+    initial_data = {
+        'objects': {},     # symbol key -> (docname, objtype, anchor)
+        'shortnames': {},  # last key component -> [symbol key, ...]
+        'modules': {},     # modname -> (docname, synopsis, platform, deprecated)
+        'docobjects': {},  # docname -> [symbol key, ...]
+        'signatures': {},  # symbol key -> signature as written
+        'shadowed': {},    # symbol key -> [(object entry, signature), ...]
+                           # of the duplicates the current entry replaced
+        'xrefs': {},       # docname -> [(role, modname, classname, target,
+                           #              refspecific), ...]
+    }
+    indices = [
+        OOCModuleIndex,
+    ]
+    data_version = 5
+
+    def note_object(self, fullname, objtype, lineno=None, sig=None):
+        """
+            Record the object *fullname* (its anchor), described with the
+            signature *sig*, for the current document.
+        """
+        self._symbol_index = None
+        key = symbol_key(fullname)
+        # without generic arguments the anchor is the key: store it once
+        key = key == fullname and fullname or intern_string(key)
+        objects = self.data['objects']
+        if key in objects and objects[key][0] != self.env.docname:
+            logger.warning(_('duplicate object description of %s, other '
+                             'instance in %s'),
+                           fullname, self.env.doc2path(objects[key][0]),
+                           location=(self.env.docname, lineno))
+            self._shadow(key)
+        else:
+            self._add_key(key)
+        objects[key] = (self.env.docname, intern_string(objtype), fullname)
+        if sig is not None:
+            self.data['signatures'][key] = sig
+        self.data['docobjects'].setdefault(self.env.docname, []).append(key)
+
+    def _shadow(self, key):
+        # keep the entry a duplicate replaces, for when that one is purged
+        self.data['shadowed'].setdefault(key, []).append(
+            (self.data['objects'][key], self.data['signatures'].get(key)))
+
+    def _add_key(self, key):
+        keys = self.data['shortnames'].setdefault(short_name(key), [])
+        if key not in keys:
+            keys.append(key)
+
+    def note_module(self, modname, synopsis, platform, deprecated):
+        self.data['modules'][modname] = (self.env.docname, synopsis,
+                                         platform, deprecated)
+
+    def process_doc(self, env, docname, document):
+        # the references of the page, for sphinx_ooc.depgraph
+        xrefs = set()
+        for node in document.traverse(addnodes.pending_xref):
+            if node.get('refdomain') != 'ooc':
+                continue
+            xrefs.add((intern_string(node['reftype']),
+                       node.get('ooc:module'), node.get('ooc:class'),
+                       intern_string(node['reftarget']),
+                       node.hasattr('refspecific')))
+        if xrefs:
+            self.data['xrefs'][docname] = list(xrefs)
+
+    def clear_doc(self, docname):
+        self._symbol_index = None
+        self.data['xrefs'].pop(docname, None)
+        objects = self.data['objects']
+        signatures = self.data['signatures']
+        shortnames = self.data['shortnames']
+        shadowed = self.data['shadowed']
+        for key in self.data['docobjects'].pop(docname, ()):
+            others = [other for other in shadowed.pop(key, ())
+                      if other[0][0] != docname]
+            if key not in objects or objects[key][0] != docname:
+                # a duplicate in another document took over
+                if others:
+                    shadowed[key] = others
+                continue
+            if others:
+                # the duplicate it replaced comes back
+                objects[key], sig = others.pop()
+                if sig is not None:
+                    signatures[key] = sig
+                else:
+                    signatures.pop(key, None)
+                if others:
+                    shadowed[key] = others
+                continue
+            del objects[key]
+            signatures.pop(key, None)
+            keys = shortnames[short_name(key)]
+            keys.remove(key)
+            if not keys:
+                del shortnames[short_name(key)]
+        modules = self.data['modules']
+        for modname, entry in list(modules.items()):
+            if entry[0] == docname:
+                del modules[modname]
+
+    def merge_domaindata(self, docnames, otherdata):
+        self._symbol_index = None
+        objects = self.data['objects']
+        docobjects = self.data['docobjects']
+        shadowed = self.data['shadowed']
+        for docname in docnames:
+            keys = otherdata['docobjects'].get(docname)
+            if not keys:
+                continue
+            docobjects[docname] = keys
+            for key in keys:
+                for other in otherdata['shadowed'].get(key, ()):
+                    if other[0][0] == docname and \
+                            other not in shadowed.get(key, ()):
+                        shadowed.setdefault(key, []).append(other)
+                entry = otherdata['objects'][key]
+                if entry[0] != docname:
+                    continue
+                if key in objects and objects[key][0] not in docnames:
+                    logger.warning(_('duplicate object description of %s, '
+                                     'other instance in %s'), entry[2],
+                                   self.env.doc2path(objects[key][0]),
+                                   location=docname)
+                    self._shadow(key)
+                objects[key] = entry
+                if key in otherdata['signatures']:
+                    self.data['signatures'][key] = otherdata['signatures'][key]
+                self._add_key(key)
+        for modname, entry in otherdata['modules'].items():
+            if entry[0] in docnames:
+                self.data['modules'][modname] = entry
+        for docname in docnames:
+            if docname in otherdata['xrefs']:
+                self.data['xrefs'][docname] = otherdata['xrefs'][docname]
+
+    def symbol_index(self):
+        """
+            Return the :class:`~sphinx_ooc.symbols.SymbolIndex` of the
+            current symbol table.
+        """
+        index = getattr(self, '_symbol_index', None)
+        if index is None:
+            index = self._symbol_index = SymbolIndex(
+                self.data['objects'], self.data['shortnames'])
+        return index
+
+    def find_obj(self, modname, classname, target, objtypes=None,
+                 searchmode=0):
+        """
+            Find an object for *target*, looked up in the context of
+            *modname* and *classname*. Returns a list of
+            ``(key, (docname, objtype, anchor))`` matches; see
+            :func:`sphinx_ooc.symbols.find_symbol` for the rules.
+        """
+        return self.symbol_index().find(modname, classname, target,
+                                        objtypes, searchmode)
+
+    def _make_module_refnode(self, builder, fromdocname, modname, contnode):
+        docname, synopsis, platform, deprecated = self.data['modules'][modname]
+        title = modname
+        if synopsis:
+            title += ': ' + synopsis
+        if deprecated:
+            title += _(' (deprecated)')
+        if platform:
+            title += ' (' + platform + ')'
+        return make_refnode(builder, fromdocname, docname,
+                            'module-' + modname, contnode, title)
+
+    def resolve_xref(self, env, fromdocname, builder, typ, target, node,
+                     contnode):
+        if typ == 'mod':
+            if target not in self.data['modules']:
+                return None
+            return self._make_module_refnode(builder, fromdocname, target,
+                                             contnode)
+        modname = node.get('ooc:module')
+        clsname = node.get('ooc:class')
+        searchmode = node.hasattr('refspecific') and 1 or 0
+        matches = self.find_obj(modname, clsname, target,
+                                self.objtypes_for_role(typ), searchmode)
+        if not matches:
+            return None
+        elif len(matches) > 1:
+            logger.warning(_('more than one target found for cross-reference '
+                             '%r: %s'), target,
+                           ', '.join(match[1][2] for match in matches),
+                           location=node)
+        docname, objtype, anchor = matches[0][1]
+        return make_refnode(builder, fromdocname, docname, anchor, contnode,
+                            anchor)
+
+    def resolve_any_xref(self, env, fromdocname, builder, target, node,
+                         contnode):
+        results = []
+        if target in self.data['modules']:
+            results.append(('ooc:mod', self._make_module_refnode(
+                builder, fromdocname, target, contnode)))
+        matches = self.find_obj(node.get('ooc:module'),
+                                node.get('ooc:class'), target, None, 1)
+        for key, (docname, objtype, anchor) in matches:
+            results.append(('ooc:' + self.role_for_objtype(objtype),
+                            make_refnode(builder, fromdocname, docname,
+                                         anchor, contnode, anchor)))
+        return results
+
+    def get_objects(self):
+        for modname, entry in self.data['modules'].items():
+            yield (modname, modname, 'module', entry[0], 'module-' + modname,
+                   0)
+        for key, (docname, objtype, anchor) in self.data['objects'].items():
+            yield (anchor, anchor, objtype, docname, anchor, 1)
+
+class OOCReferenceResolver(SphinxPostTransform):
+    """
+        Resolve the ooc references of a doctree in one go, before the
+        generic resolver. What is not found is left to the generic resolver
+        (and so to the ``missing-reference`` handlers and its warnings).
+    """
+    default_priority = 5
+
+    def run(self, **kwargs):
+        env = self.document.settings.env
+        domain = env.get_domain('ooc')
+        for node in list(self.document.traverse(addnodes.pending_xref)):
+            if node.get('refdomain') != 'ooc':
+                continue
+            try:
+                newnode = domain.resolve_xref(
+                    env, node.get('refdoc', env.docname), self.app.builder,
+                    node['reftype'], node['reftarget'], node,
+                    node[0].deepcopy())
+            except NoUri:
+                newnode = None
+            if newnode is not None:
+                node.replace_self(newnode)
+
+def report_lookups(app, exception):
+    """
+        Log how many distinct lookups the ooc references took; connected to
+        ``build-finished``.
+    """
+    index = getattr(app.env.get_domain('ooc'), '_symbol_index', None)
+    if exception is None and index is not None and index.references:
+        logger.info('resolved %d ooc references with %d distinct lookups',
+                    index.references, index.lookups)
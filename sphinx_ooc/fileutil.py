@@ -0,0 +1,47 @@
+"""
+    File helpers shared by the SDK page generator and the builders, without
+    any Sphinx dependency.
+"""
+import os
+import tempfile
+
+def write_if_changed(filename, text):
+    """
+        Write *text* (or bytes) to *filename* unless it already has that
+        content. The new content is written to a temporary file first and
+        renamed over the old one, so readers never see a half-written page.
+        Returns True if the file was written.
+    """
+    data = text
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    try:
+        f = open(filename, 'rb')
+        try:
+            if f.read() == data:
+                return False
+        finally:
+            f.close()
+    except (IOError, OSError):
+        pass
+    dirname = os.path.dirname(filename)
+    if dirname and not os.path.isdir(dirname):
+        try:
+            os.makedirs(dirname)
+        except OSError:
+            # another worker was faster
+            if not os.path.isdir(dirname):
+                raise
+    fd, tmpname = tempfile.mkstemp(dir=dirname or '.', suffix='.tmp')
+    try:
+        os.write(fd, data)
+        os.close(fd)
+        os.chmod(tmpname, 0o644)
+        if os.name == 'nt' and os.path.exists(filename):
+            os.remove(filename)
+        os.rename(tmpname, filename)
+    except Exception:
+        if os.path.exists(tmpname):
+            os.remove(tmpname)
+        raise
+    return True
@@ -0,0 +1,132 @@
+"""
+    Lazy loaded member descriptions for huge API pages.
+
+    With ``ooc_lazy_members = N`` in conf.py, the HTML builders write the
+    pages with at least N described class members as a skeleton: the
+    headings, the class and cover descriptions and all signatures stay in
+    the page, but the description of each member goes into its own small
+    script in ``_ooc_fragments/<page>/``, which ``oocfragments.js`` loads
+    when the member is scrolled into view. Descriptions shorter than
+    ``FRAGMENT_MIN_SIZE`` bytes of HTML stay in the page, where they cost
+    less than the placeholder and the request. The page also gets a map of
+    every anchor in the moved descriptions (and of their members) to the
+    fragment, so a link to any of them loads the fragment first.
+
+    The descriptions stay in the doctree, so they are still in the full
+    text search index; only the HTML is moved out of the page.
+"""
+import json
+import os
+
+from docutils import nodes
+
+from sphinx import addnodes
+
+from sphinx_ooc.fileutil import write_if_changed
+from sphinx_ooc.symbols import MEMBER_OBJTYPES
+
+FRAGMENTS_DIR = '_ooc_fragments'
+BUILDERS = ('html', 'dirhtml')
+FRAGMENT_MIN_SIZE = 512
+
+class ooc_fragment(nodes.General, nodes.Element):
+    """
+        The description of a member, written to a fragment of its own if
+        it is big enough.
+    """
+
+class ooc_fragment_anchors(nodes.General, nodes.Element):
+    """
+        The anchor map of the fragments written for a page, at its end.
+    """
+
+def visit_ooc_fragment(self, node):
+    node.start = len(self.body)
+
+def depart_ooc_fragment(self, node):
+    html = ''.join(self.body[node.start:])
+    if len(html) < FRAGMENT_MIN_SIZE:
+        return
+    del self.body[node.start:]
+    fragment = node['fragment']
+    write_if_changed(
+        os.path.join(self.builder.outdir, FRAGMENTS_DIR,
+                     *(fragment + '.js').split('/')),
+        'OOCFragments.set(%s, %s);\n' % (json.dumps(fragment),
+                                         json.dumps(html)))
+    self.body.append('<div class="ooc-fragment" data-fragment="%s"></div>'
+                     % self.attval(fragment))
+    if not hasattr(self, 'ooc_fragments'):
+        self.ooc_fragments = {}
+    self.ooc_fragments[fragment] = node['anchors']
+
+def visit_ooc_fragment_anchors(self, node):
+    fragments = getattr(self, 'ooc_fragments', {})
+    _remove_stale(self.builder.outdir, node['docname'], fragments)
+    if fragments:
+        anchors = dict((anchor, fragment)
+                       for fragment in fragments
+                       for anchor in fragments[fragment])
+        self.body.append('<script>OOCFragments.addAnchors(%s);</script>'
+                         % json.dumps(anchors, sort_keys=True))
+    raise nodes.SkipNode
+
+def _member_contents(doctree):
+    for desc in doctree.traverse(addnodes.desc):
+        if desc.get('domain') != 'ooc' or \
+                desc.get('objtype') not in MEMBER_OBJTYPES:
+            continue
+        content = desc.children[-1]
+        if isinstance(content, addnodes.desc_content) and content.children:
+            yield desc, content
+
+def _remove_stale(outdir, docname, fragments):
+    # fragments of members the page does not have (or inlines) any more
+    dirname = os.path.join(outdir, FRAGMENTS_DIR, *docname.split('/'))
+    if not os.path.isdir(dirname):
+        return
+    for filename in os.listdir(dirname):
+        index, ext = os.path.splitext(filename)
+        if ext == '.js' and index.isdigit() and \
+                '%s/%s' % (docname, index) not in fragments:
+            os.remove(os.path.join(dirname, filename))
+
+def split_members(app, doctree, docname):
+    """
+        Move the member descriptions of big pages into fragments;
+        connected to ``doctree-resolved``.
+    """
+    if not app.config.ooc_lazy_members or app.builder.name not in BUILDERS:
+        return
+    members = list(_member_contents(doctree))
+    if len(members) < app.config.ooc_lazy_members:
+        _remove_stale(app.builder.outdir, docname, {})
+        return
+    for i, (desc, content) in enumerate(members):
+        anchors = [anchor for node in desc.traverse(nodes.Element)
+                   for anchor in node.get('ids', ())]
+        wrapper = ooc_fragment(fragment='%s/%d' % (docname, i),
+                               anchors=anchors)
+        wrapper.extend(content.children[:])
+        content[:] = [wrapper]
+    doctree += ooc_fragment_anchors(docname=docname)
+
+def add_fragments_script(app):
+    """
+        Ship ``oocfragments.js`` with the HTML builders; connected to
+        ``builder-inited``.
+    """
+    if not app.config.ooc_lazy_members or app.builder.name not in BUILDERS:
+        return
+    # the script is in searchindex.STATIC_DIR, see add_static_path there
+    add_js_file = getattr(app, 'add_js_file', None) or app.add_javascript
+    add_js_file('oocfragments.js')
+
+def setup_fragments(app):
+    app.add_config_value('ooc_lazy_members', 0, 'html')
+    app.add_node(ooc_fragment,
+                 html=(visit_ooc_fragment, depart_ooc_fragment))
+    app.add_node(ooc_fragment_anchors,
+                 html=(visit_ooc_fragment_anchors, None))
+    app.connect('builder-inited', add_fragments_script)
+    app.connect('doctree-resolved', split_members)
@@ -0,0 +1,221 @@
+"""
+    Syntax highlighting of ooc code.
+
+    :class:`OOCLexer` tokenizes with one precompiled regular expression, an
+    alternation of all token rules, in a single pass without lexer states,
+    and falls back to plain text for anything it does not know instead of
+    producing error tokens (which make Sphinx warn and highlight again).
+
+    The highlighted blocks are also cached between builds, in
+    ``ooc-highlight.pickle`` in the doctree directory, keyed by a hash of
+    the code, its options, the output format and style and the lexer and
+    Pygments versions, so unchanged snippets are not highlighted again on
+    rebuilds. Blocks highlighted by parallel writer processes are used but
+    not added to the cache.
+"""
+import hashlib
+import os
+import re
+from collections import OrderedDict
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import pygments
+from pygments.lexer import Lexer
+from pygments.token import Text, Comment, Operator, Keyword, Name, \
+    String, Number, Punctuation
+
+# bump when the tokens for some code change
+LEXER_VERSION = 1
+CACHE_NAME = 'ooc-highlight.pickle'
+
+KEYWORDS = (
+    'class', 'interface', 'implement', 'abstract', 'extends', 'from', 'this',
+    'super', 'new', 'const', 'final', 'static', 'import', 'use', 'extern',
+    'inline', 'proto', 'break', 'continue', 'fallthrough', 'operator', 'if',
+    'else', 'for', 'while', 'do', 'switch', 'case', 'match', 'as', 'in',
+    'version', 'return', 'true', 'false', 'null', 'func', 'cover', 'enum',
+    'unmangled', 'internal', 'into', 'include', 'try', 'catch', 'throw',
+)
+
+# (name, regular expression, token or (regular expression, tokens) for
+# the groups of the match); the first rule that matches wins
+_rules = [
+    ('comment', r'//[^\n]*', Comment.Single),
+    ('multiline', r'/\*[\s\S]*?(?:\*/|\Z)', Comment.Multiline),
+    ('string', r'"(?:\\[\s\S]|[^\\"])*"', String.Double),
+    ('char', r"'(?:\\(?:[0-7]{1,3}|x[0-9a-fA-F]{1,2}|.)|[^\\'\n])'",
+     String.Char),
+    ('include', r'include[ \t]+[\w/][\w/, \t]*',
+     (r'(include)([ \t]+)(.*)', (Keyword.Namespace, Text, Name.Namespace))),
+    ('coverfrom', r'cover[ \t]+from[ \t]+\w+[*@]?',
+     (r'(cover)([ \t]+)(from)([ \t]+)(.*)',
+      (Keyword, Text, Keyword, Text, Name.Class))),
+    ('suffixed', r'func(?:[ \t]|\\\n)+~[a-z_]\w*',
+     (r'(func)([\s\\]+)(.*)', (Keyword, Text, Name.Function))),
+    ('keyword', r'(?:%s)\b' % '|'.join(KEYWORDS), Keyword),
+    ('member', r'\.[ \t]*[a-z_]\w*',
+     (r'(\.)([ \t]*)(.*)', (Operator, Text, Name.Function))),
+    ('constant', r'[A-Z][A-Z0-9_]+\b', Name.Constant),
+    ('classname', r'[A-Z]\w*(?:[@*]|\[[ \t]*\])?', Name.Class),
+    ('call', r'[a-z_]\w*(?:~[a-z_]\w*)?(?=(?:[ \t]|\\\n)*\()',
+     Name.Function),
+    ('name', r'[a-z_]\w*', Name.Variable),
+    ('hex', r'0x[0-9a-fA-F]+', Number.Hex),
+    ('oct', r'0c[0-7]+', Number.Oct),
+    ('bin', r'0b[01]+', Number.Bin),
+    ('float', r'[0-9][0-9_]*\.[0-9_]+', Number.Float),
+    ('decimal', r'[0-9][0-9_]*', Number.Integer),
+    ('operator', r'==?|\+=?|-[=>]?|\*=?|/=?|:=|!=?|%=?|\?|>{1,3}=?|'
+     r'<{1,3}=?|\.\.|&&?|\|\|?|\^=?|~', Operator),
+    ('punctuation', r'[:(){}\[\];,@.]', Punctuation),
+    ('space', r'\s+', Text),
+    ('other', r'[\s\S]', Text),
+]
+
+_token_re = re.compile('|'.join(['(?P<%s>%s)' % (name, regex)
+                                 for name, regex, action in _rules]))
+_actions = {}
+for _name, _regex, _action in _rules:
+    if type(_action) is tuple:
+        _action = (re.compile(_action[0], re.DOTALL), _action[1])
+    _actions[_name] = _action
+
+class OOCLexer(Lexer):
+    """
+        Lexer for ooc source code.
+    """
+    name = 'ooc'
+    aliases = ['ooc']
+    filenames = ['*.ooc']
+    mimetypes = ['text/x-ooc']
+
+    def get_tokens_unprocessed(self, text):
+        actions = _actions
+        for match in _token_re.finditer(text):
+            action = actions[match.lastgroup]
+            if type(action) is tuple:
+                regex, tokens = action
+                start = match.start()
+                groups = regex.match(match.group())
+                for i, token in enumerate(tokens):
+                    if groups.group(i + 1):
+                        yield (start + groups.start(i + 1), token,
+                               groups.group(i + 1))
+            else:
+                yield match.start(), action, match.group()
+
+class HighlightCache(object):
+    """
+        Least recently used cache of highlighted blocks, by key.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.changed = False
+
+    def get(self, key):
+        try:
+            value = self.entries.pop(key)
+        except KeyError:
+            return None
+        self.entries[key] = value
+        return value
+
+    def set(self, key, value):
+        entries = self.entries
+        if entries and len(entries) >= self.maxsize:
+            entries.popitem(last=False)
+        entries[key] = value
+        self.changed = True
+
+    def load(self, filename):
+        try:
+            f = open(filename, 'rb')
+            try:
+                version, entries = pickle.load(f)
+            finally:
+                f.close()
+        except Exception:
+            # missing, unreadable or from another version: start empty
+            return
+        if version == (LEXER_VERSION, pygments.__version__):
+            self.entries = entries
+
+    def save(self, filename):
+        if not self.changed:
+            return
+        tmpname = filename + '.tmp'
+        f = open(tmpname, 'wb')
+        try:
+            pickle.dump(((LEXER_VERSION, pygments.__version__),
+                         self.entries), f, pickle.HIGHEST_PROTOCOL)
+        finally:
+            f.close()
+        os.rename(tmpname, filename)
+        self.changed = False
+
+class CachingHighlighter(object):
+    """
+        Wraps a Sphinx highlighter (``PygmentsBridge``) and looks up ooc
+        blocks in *cache* before highlighting them.
+    """
+
+    def __init__(self, highlighter, cache):
+        self.highlighter = highlighter
+        self.cache = cache
+        style = getattr(highlighter, 'formatter_args', {}).get('style')
+        self.variant = (getattr(highlighter, 'dest', None),
+                        getattr(style, '__name__', repr(style)))
+
+    def __getattr__(self, name):
+        return getattr(self.highlighter, name)
+
+    def highlight_block(self, source, lang, *args, **kwargs):
+        if lang not in OOCLexer.aliases:
+            return self.highlighter.highlight_block(source, lang, *args,
+                                                    **kwargs)
+        options = sorted((name, value) for name, value in kwargs.items()
+                         if name not in ('location', 'warn'))
+        key = hashlib.sha1(repr((self.variant, args, options, source))
+                           .encode('utf-8')).hexdigest()
+        result = self.cache.get(key)
+        if result is None:
+            result = self.highlighter.highlight_block(source, lang, *args,
+                                                      **kwargs)
+            self.cache.set(key, result)
+        return result
+
+def install_highlight_cache(app):
+    """
+        Wrap the highlighters of the builder; connected to
+        ``builder-inited``.
+    """
+    builder = app.builder
+    if not hasattr(builder, 'highlighter'):
+        return
+    cache = HighlightCache()
+    cache.load(os.path.join(app.doctreedir, CACHE_NAME))
+    app.ooc_highlight_cache = cache
+    for name in ('highlighter', 'dark_highlighter'):
+        highlighter = getattr(builder, name, None)
+        if highlighter is not None:
+            setattr(builder, name, CachingHighlighter(highlighter, cache))
+
+def save_highlight_cache(app, exception):
+    cache = getattr(app, 'ooc_highlight_cache', None)
+    if cache is not None and exception is None:
+        cache.save(os.path.join(app.doctreedir, CACHE_NAME))
+
+def setup_highlight(app):
+    import sphinx
+    if sphinx.version_info >= (2, 1):
+        app.add_lexer('ooc', OOCLexer)
+    else:
+        app.add_lexer('ooc', OOCLexer())
+    app.connect('builder-inited', install_highlight_cache)
+    app.connect('build-finished', save_highlight_cache)
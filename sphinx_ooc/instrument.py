@@ -0,0 +1,175 @@
+"""
+    Opt-in profiling of the extension's hot paths.
+
+    With ``ooc_profile = True`` in conf.py, the signature handling, its
+    parse step, type annotation parsing, target registration and the
+    cross-reference roles record their call counts and cumulative time per
+    document in ``env.ooc_profile``. The data is merged back from parallel
+    readers, and a ranked report (hot paths, pages by hot path time,
+    slowest signatures) is logged at the end of the build. If
+    ``ooc_profile`` is a file name ending in ``.json``, the raw data is
+    also dumped there, relative to the output directory; ``-D
+    ooc_profile=0`` (or ``false``) turns profiling off. Setting
+    ``ooc_profile`` does not make Sphinx read the documents again; only
+    those read in the build are profiled (use ``-E`` for all of them).
+
+    Times are inclusive: ``handle_signature`` contains the
+    ``parse_signature``, ``resolve_typeref`` and ``role`` time spent for it.
+    The hot path time of a page is the sum of its outermost hot paths, so
+    a role called while a signature is handled is not counted twice; it is
+    not the time it took to read the page.
+"""
+import json
+import os
+import time
+
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+# slowest signatures kept per document
+KEEP_SIGNATURES = 10
+REPORT_LENGTH = 10
+
+class _NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_null_timer = _NullTimer()
+
+class _Timer(object):
+    # number of hot paths being timed; only the outermost add to the page
+    depth = 0
+
+    def __init__(self, env, hotpath, detail):
+        self.env = env
+        self.hotpath = hotpath
+        self.detail = detail
+
+    def __enter__(self):
+        _Timer.depth += 1
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.time() - self.start
+        _Timer.depth -= 1
+        env = self.env
+        doc = env.ooc_profile.setdefault(env.docname,
+                                         {'calls': {}, 'signatures': [],
+                                          'time': 0.0})
+        if not _Timer.depth:
+            doc['time'] += elapsed
+        calls = doc['calls'].setdefault(self.hotpath, [0, 0.0])
+        calls[0] += 1
+        calls[1] += elapsed
+        if self.detail is not None:
+            signatures = doc['signatures']
+            signatures.append([elapsed, self.detail])
+            if len(signatures) > 2 * KEEP_SIGNATURES:
+                signatures.sort(reverse=True)
+                del signatures[KEEP_SIGNATURES:]
+        return False
+
+def profiled(env, hotpath, detail=None):
+    """
+        Return a context manager timing *hotpath* for the current document
+        of *env*; a no-op unless ``ooc_profile`` is set. *detail* (a
+        signature) is kept for the slowest signatures report.
+    """
+    if not env.config.ooc_profile:
+        return _null_timer
+    if not hasattr(env, 'ooc_profile'):
+        env.ooc_profile = {}
+    return _Timer(env, hotpath, detail)
+
+def reset_profile(app, env, docnames):
+    """
+        Start from scratch for every build, so the report only covers the
+        documents read in it.
+    """
+    if app.config.ooc_profile:
+        env.ooc_profile = {}
+
+def purge_profile(app, env, docname):
+    if hasattr(env, 'ooc_profile'):
+        env.ooc_profile.pop(docname, None)
+
+def merge_profile(app, env, docnames, other):
+    if not app.config.ooc_profile or not hasattr(other, 'ooc_profile'):
+        return
+    if not hasattr(env, 'ooc_profile'):
+        env.ooc_profile = {}
+    for docname in docnames:
+        if docname in other.ooc_profile:
+            env.ooc_profile[docname] = other.ooc_profile[docname]
+
+def collect(data):
+    """
+        Aggregate per-document profile *data* into ``(hotpaths, pages,
+        signatures)``, each sorted by time, slowest first.
+    """
+    totals = {}
+    pages = []
+    signatures = []
+    for docname, doc in data.items():
+        for hotpath, (count, seconds) in doc['calls'].items():
+            total = totals.setdefault(hotpath, [0, 0.0])
+            total[0] += count
+            total[1] += seconds
+        pages.append((doc['time'], docname))
+        for seconds, sig in doc['signatures']:
+            signatures.append((seconds, docname, sig))
+    hotpaths = sorted([(seconds, hotpath, count) for hotpath, (count, seconds)
+                       in totals.items()], reverse=True)
+    return hotpaths, sorted(pages, reverse=True), sorted(signatures,
+                                                         reverse=True)
+
+def report_profile(app, exception):
+    if exception is not None or not app.config.ooc_profile:
+        return
+    data = getattr(app.env, 'ooc_profile', {})
+    hotpaths, pages, signatures = collect(data)
+    logger.info('ooc profile of %d documents:' % len(data))
+    logger.info('  %-22s %10s %10s %10s' % ('hot path', 'calls', 'total s',
+                                           'mean us'))
+    for seconds, hotpath, count in hotpaths:
+        logger.info('  %-22s %10d %10.3f %10.1f' % (
+            hotpath, count, seconds, seconds / count * 1e6))
+    logger.info('  pages by hot path time (outermost calls only):')
+    for seconds, docname in pages[:REPORT_LENGTH]:
+        logger.info('  %10.3f s  %s' % (seconds, docname))
+    logger.info('  slowest signatures:')
+    for seconds, docname, sig in signatures[:REPORT_LENGTH]:
+        logger.info('  %10.1f us  %s: %s' % (seconds * 1e6, docname, sig))
+    dumpfile = app.config.ooc_profile
+    if isinstance(dumpfile, str) and dumpfile.endswith('.json'):
+        filename = os.path.join(app.outdir, dumpfile)
+        f = open(filename, 'w')
+        try:
+            json.dump(data, f, indent=1, sort_keys=True)
+        finally:
+            f.close()
+        logger.info('ooc profile data written to %s' % filename)
+
+def check_profile(app, config):
+    """
+        Turn the string values of ``-D ooc_profile=...`` that mean off into
+        False; connected to ``config-inited``.
+    """
+    value = config.ooc_profile
+    if isinstance(value, str) and \
+            value.strip().lower() in ('', '0', 'false', 'no', 'off'):
+        config.ooc_profile = False
+
+def setup_instrument(app):
+    # profiling does not change the doctrees: no need to read them again
+    app.add_config_value('ooc_profile', False, '', types=(bool, str))
+    app.connect('config-inited', check_profile)
+    app.connect('env-before-read-docs', reset_profile)
+    app.connect('env-purge-doc', purge_profile)
+    app.connect('env-merge-info', merge_profile)
+    app.connect('build-finished', report_profile)
@@ -0,0 +1,273 @@
+"""
+    ooc references into other projects' docs.
+
+    The ooc symbols go into the ``objects.inv`` inventory of the HTML
+    builders like those of any other domain (see
+    :meth:`OOCDomain.get_objects`), named by their anchors, with the
+    object types as roles. Plain intersphinx only finds a symbol under
+    exactly that name, though, while ooc references leave out generic
+    arguments, modules and classes. So the extension loads the inventories
+    in ``ooc_inventories`` itself::
+
+        ooc_inventories = {
+            'sdk': ('https://docs.ooc-lang.org/', None),
+            'gtk': ('https://example.org/ooc-gtk/', 'inv/gtk-objects.inv'),
+        }
+
+    maps a name to the base URI of the docs and the location of their
+    inventory, a local file or a URL (None: ``objects.inv`` in the base
+    URI). The ooc entries of each are indexed like the domain's own
+    symbol table, so a reference that is not found in the docs themselves
+    is resolved with the same rules (see :mod:`sphinx_ooc.symbols`) in the
+    inventories, in the order of their names; ``sdk:HashMap`` only looks
+    in ``sdk``.
+
+    Parsed inventories are cached in ``ooc-inventories.pickle`` in the
+    doctree directory: local files are parsed again when they change,
+    URLs fetched again after ``ooc_inventory_cache_limit`` days, and a
+    cached copy is used when they cannot be fetched, so builds work
+    offline.
+"""
+import os
+import posixpath
+import re
+import time
+import zlib
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    from urllib.request import urlopen
+except ImportError:
+    from urllib2 import urlopen
+
+from docutils import nodes
+
+from sphinx.locale import _
+from sphinx.util import logging
+
+from sphinx_ooc.symbols import symbol_key, short_name, find_symbol
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAME = 'ooc-inventories.pickle'
+# bump when Inventory changes
+CACHE_VERSION = 1
+
+inventory_line_re = re.compile(r'(.+?)\s+ooc:(\S+)\s+(-?\d+)\s+?(\S*)\s+(.*)')
+
+class Inventory(object):
+    """
+        The ooc symbols of an ``objects.inv`` file: *objects* maps symbol
+        keys to ``(uri, objtype, anchor)``, *shortnames* short names to
+        keys, as in the domain data, and *modules* module names to URIs.
+    """
+
+    def __init__(self, project, version):
+        self.project = project
+        self.version = version
+        self.objects = {}
+        self.shortnames = {}
+        self.modules = {}
+
+    def add(self, name, objtype, uri):
+        if objtype == 'module':
+            self.modules[name] = uri
+            return
+        key = symbol_key(name)
+        if key not in self.objects:
+            self.shortnames.setdefault(short_name(key), []).append(key)
+        self.objects[key] = (uri, objtype, name)
+
+    def find(self, typ, modname, classname, target, objtypes, searchmode):
+        """
+            Return the ``(uri, anchor)`` pairs of the objects an ooc
+            reference may point to, best match first.
+        """
+        if typ == 'mod':
+            if target not in self.modules:
+                return []
+            return [(self.modules[target], target)]
+        matches = find_symbol(self.objects, self.shortnames, modname,
+                              classname, target, objtypes, searchmode)
+        return [(entry[0], entry[2]) for key, entry in matches]
+
+def parse_inventory(data):
+    """
+        Return the :class:`Inventory` of the ooc entries in the contents of
+        an ``objects.inv`` file (version 2), with the URIs as given.
+    """
+    lines = data.split(b'\n', 4)
+    if len(lines) < 5 or \
+            lines[0].rstrip() != b'# Sphinx inventory version 2':
+        raise ValueError('not a version 2 Sphinx inventory')
+    project = lines[1].decode('utf-8')[len('# Project: '):].rstrip()
+    version = lines[2].decode('utf-8')[len('# Version: '):].rstrip()
+    inventory = Inventory(project, version)
+    for line in zlib.decompress(lines[4]).decode('utf-8').splitlines():
+        if ' ooc:' not in line:
+            continue
+        m = inventory_line_re.match(line.rstrip())
+        if m is None:
+            continue
+        name, objtype, priority, uri, dispname = m.groups()
+        if uri.endswith('$'):
+            uri = uri[:-1] + name
+        inventory.add(name, objtype, uri)
+    return inventory
+
+def _read(location):
+    if '://' in location:
+        f = urlopen(location)
+    else:
+        f = open(location, 'rb')
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+class InventoryCache(object):
+    """
+        The parsed inventories by location, kept on disk between builds.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.entries = {}
+        self.changed = False
+
+    def load(self, filename):
+        try:
+            f = open(filename, 'rb')
+            try:
+                version, entries = pickle.load(f)
+            finally:
+                f.close()
+        except Exception:
+            # missing, unreadable or from another version: start empty
+            return
+        if version == CACHE_VERSION:
+            self.entries = entries
+
+    def save(self, filename):
+        if not self.changed:
+            return
+        tmpname = filename + '.tmp'
+        f = open(tmpname, 'wb')
+        try:
+            pickle.dump((CACHE_VERSION, self.entries), f,
+                        pickle.HIGHEST_PROTOCOL)
+        finally:
+            f.close()
+        os.rename(tmpname, filename)
+        self.changed = False
+
+    def _stamp(self, location):
+        if '://' in location:
+            return None
+        stat = os.stat(location)
+        return (stat.st_mtime, stat.st_size)
+
+    def get(self, location):
+        """
+            Return the :class:`Inventory` at *location*, from the cache if
+            it is still fresh.
+        """
+        cached = self.entries.get(location)
+        try:
+            stamp = self._stamp(location)
+            if cached is not None:
+                if stamp is not None and cached[0] == stamp:
+                    return cached[2]
+                if stamp is None and \
+                        time.time() - cached[1] < self.limit * 86400:
+                    return cached[2]
+            inventory = parse_inventory(_read(location))
+        except Exception as e:
+            if cached is None:
+                raise
+            logger.warning(_('could not update the ooc inventory %s (%s), '
+                             'using the cached copy'), location, e)
+            return cached[2]
+        self.entries[location] = (stamp, time.time(), inventory)
+        self.changed = True
+        return inventory
+
+def load_inventories(app):
+    """
+        Load the inventories in ``ooc_inventories``; connected to
+        ``builder-inited``.
+    """
+    app.ooc_inventories = []
+    if not app.config.ooc_inventories:
+        return
+    cache = InventoryCache(app.config.ooc_inventory_cache_limit)
+    cache.load(os.path.join(app.doctreedir, CACHE_NAME))
+    for name in sorted(app.config.ooc_inventories):
+        base, location = app.config.ooc_inventories[name]
+        if not location:
+            location = posixpath.join(base, 'objects.inv')
+        elif '://' not in location:
+            location = os.path.join(app.confdir, location)
+        try:
+            inventory = cache.get(location)
+        except Exception as e:
+            logger.warning(_('failed to load the ooc inventory %s: %s'),
+                           location, e)
+            continue
+        app.ooc_inventories.append((name, base, inventory))
+    cache.save(os.path.join(app.doctreedir, CACHE_NAME))
+
+def missing_reference(app, env, node, contnode):
+    """
+        Resolve the ooc references the domain does not find in the
+        inventories; connected to ``missing-reference``.
+    """
+    inventories = getattr(app, 'ooc_inventories', None)
+    if not inventories or node.get('refdomain') != 'ooc':
+        return None
+    typ = node['reftype']
+    target = node['reftarget']
+    names = None
+    if ':' in target:
+        prefix, rest = target.split(':', 1)
+        if any(name == prefix for name, base, inventory in inventories):
+            names, target = (prefix,), rest
+    objtypes = env.get_domain('ooc').objtypes_for_role(typ)
+    searchmode = node.hasattr('refspecific') and 1 or 0
+    for name, base, inventory in inventories:
+        if names is not None and name not in names:
+            continue
+        matches = inventory.find(typ, node.get('ooc:module'),
+                                 node.get('ooc:class'), target, objtypes,
+                                 searchmode)
+        if not matches:
+            continue
+        elif len(matches) > 1:
+            # as the domain does for its own symbols
+            logger.warning(_('more than one target found for cross-reference '
+                             '%r: %s'), target,
+                           ', '.join(match[1] for match in matches),
+                           location=node)
+        uri = posixpath.join(base, matches[0][0])
+        if '://' not in uri and node.get('refdoc'):
+            # a local base is relative to the output directory
+            uri = '../' * node['refdoc'].count('/') + uri
+        if inventory.version:
+            title = _('(in %s v%s)') % (inventory.project, inventory.version)
+        else:
+            title = _('(in %s)') % inventory.project
+        newnode = nodes.reference('', '', internal=False, refuri=uri,
+                                  reftitle=title)
+        newnode.append(contnode)
+        return newnode
+    return None
+
+def setup_inventories(app):
+    app.add_config_value('ooc_inventories', {}, 'env')
+    app.add_config_value('ooc_inventory_cache_limit', 5, '')
+    app.connect('builder-inited', load_inventories)
+    app.connect('missing-reference', missing_reference)
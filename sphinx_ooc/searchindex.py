@@ -0,0 +1,152 @@
+"""
+    Sharded search index of the documented ooc symbols.
+
+    Sphinx's ``searchindex.js`` holds every word of every page and has to be
+    loaded whole before anything can be searched. The HTML builders also
+    write ``_ooc_search/`` with the documented ooc objects only: a small
+    ``index.js`` with the tables every entry refers to (pages, modules,
+    object types) and the list of shards, and a ``shard-<prefix>.js`` per
+    name prefix holding the symbols whose name starts with it, sorted by
+    name. ``oocsearch.js`` loads the shard a query needs when it is made,
+    and lists the matching symbols above the full text results of the
+    search page.
+
+    A shard entry is ``[name, module, path, objtype, page, signature]``,
+    where *module*, *objtype* and *page* index the tables (*module* is null
+    outside of modules), *path* is the anchor without the module and
+    *signature* the signature without the name.
+"""
+import json
+import os
+
+from sphinx_ooc.fileutil import write_if_changed
+from sphinx_ooc.symbols import short_name, plain_signature, split_anchor, \
+    page_modules
+
+SEARCH_DIR = '_ooc_search'
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'static')
+INDEX_VERSION = 1
+# must match OOCSearch.PREFIX_LENGTH in oocsearch.js
+PREFIX_LENGTH = 2
+
+def shard_key(name):
+    """
+        Return the shard of the symbol *name*: its first characters,
+        lowercased, with anything but ASCII letters and digits as ``_``.
+    """
+    key = ''
+    for char in name[:PREFIX_LENGTH].lower():
+        if not ('a' <= char <= 'z' or '0' <= char <= '9'):
+            char = '_'
+        key += char
+    return key
+
+class _Table(object):
+    """
+        A list of distinct values, referred to by position.
+    """
+
+    def __init__(self):
+        self.values = []
+        self.positions = {}
+
+    def __call__(self, value):
+        if value not in self.positions:
+            self.positions[value] = len(self.values)
+            self.values.append(value)
+        return self.positions[value]
+
+def build_index(domain, target_uri):
+    """
+        Return ``(index, shards)`` for the objects of the ooc *domain*;
+        *target_uri* maps a docname to the URI of its page. *shards* maps
+        each shard key to its sorted entries.
+    """
+    docmodules = page_modules(domain.data['modules'])
+    signatures = domain.data['signatures']
+    pages = _Table()
+    modules = _Table()
+    objtypes = _Table()
+    shards = {}
+    for key, (docname, objtype, anchor) in sorted(
+            domain.data['objects'].items()):
+        module, path = split_anchor(anchor, docmodules.get(docname, ()))
+        if module is not None:
+            module = modules(module)
+        name = short_name(key)
+        sig = plain_signature(signatures.get(key, ''))
+        last = short_name(path)
+        if sig.startswith(last):
+            sig = sig[len(last):].lstrip()
+        shards.setdefault(shard_key(name), []).append(
+            [name, module, path, objtypes(objtype),
+             pages(target_uri(docname)), sig])
+    for entries in shards.values():
+        entries.sort(key=lambda entry: (entry[0].lower(), entry[2]))
+    index = {
+        'version': INDEX_VERSION,
+        'pages': pages.values,
+        'modules': modules.values,
+        'objtypes': objtypes.values,
+        'shards': dict((key, len(entries))
+                       for key, entries in shards.items()),
+    }
+    return index, shards
+
+def _script(function, *args):
+    return 'OOCSearch.%s(%s);\n' % (function, ','.join(
+        [json.dumps(arg, separators=(',', ':'), sort_keys=True)
+         for arg in args]))
+
+def write_search_index(app, exception):
+    """
+        Write the index for the search page of the HTML builders;
+        connected to ``build-finished``. Only changed files are rewritten.
+    """
+    builder = app.builder
+    if exception is not None or not app.config.ooc_search_index or \
+            not getattr(builder, 'search', False):
+        return
+    index, shards = build_index(app.env.get_domain('ooc'),
+                                builder.get_target_uri)
+    outdir = os.path.join(builder.outdir, SEARCH_DIR)
+    write_if_changed(os.path.join(outdir, 'index.js'),
+                     _script('setIndex', index))
+    filenames = set(['index.js'])
+    for key, entries in shards.items():
+        filename = 'shard-%s.js' % key
+        filenames.add(filename)
+        write_if_changed(os.path.join(outdir, filename),
+                         _script('setShard', key, entries))
+    for filename in os.listdir(outdir):
+        if filename not in filenames:
+            os.remove(os.path.join(outdir, filename))
+
+def add_static_path(app, config):
+    """
+        Add the directory of ``oocsearch.js`` and ``oocfragments.js`` to a
+        copy of ``html_static_path``, leaving the list of conf.py alone;
+        connected to ``config-inited``.
+    """
+    if (config.ooc_search_index or config.ooc_lazy_members) and \
+            STATIC_DIR not in config.html_static_path:
+        config.html_static_path = list(config.html_static_path) + \
+            [STATIC_DIR]
+
+def add_search_script(app):
+    """
+        Ship ``oocsearch.js`` with the HTML builders; connected to
+        ``builder-inited``.
+    """
+    if not app.config.ooc_search_index or \
+            not getattr(app.builder, 'search', False):
+        return
+    add_js_file = getattr(app, 'add_js_file', None) or app.add_javascript
+    add_js_file('oocsearch.js')
+
+def setup_search_index(app):
+    app.add_config_value('ooc_search_index', True, 'html')
+    app.connect('config-inited', add_static_path)
+    app.connect('builder-inited', add_search_script)
+    app.connect('build-finished', write_search_index)
@@ -0,0 +1,130 @@
+"""
+    Rendered ooc signatures, cached between builds.
+
+    Most signatures of a page that is read again are the ones it had in
+    the last build. :class:`~sphinx_ooc.desc.OOCDesc` looks each signature
+    up in :data:`rendered_signatures` first, by the signature text, the
+    object type and the current module and class, and on a hit copies the
+    nodes it rendered the last time into the ``desc_signature`` instead of
+    parsing the signature and its type annotations again. Only signatures
+    whose nodes have no document-level side effects are cached (see
+    :func:`sphinx_ooc.desc._is_cacheable`).
+
+    The cache is kept in ``ooc-signatures.pickle`` in the doctree
+    directory, is bounded to ``ooc_signature_cache_size`` entries (least
+    recently used ones are dropped first), and is thrown away when the
+    extension or Sphinx is updated or a configuration value that affects
+    reading changes. Signatures rendered by parallel reader processes are
+    used but not added to the cache.
+"""
+import os
+from collections import OrderedDict
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import sphinx
+
+from sphinx_ooc import __version__
+
+try:
+    from sphinx.environment import CONFIG_OK
+except ImportError:
+    # no way to tell if the configuration changed: always start empty
+    CONFIG_OK = object()
+
+CACHE_NAME = 'ooc-signatures.pickle'
+# bump when the rendering of signatures changes
+CACHE_VERSION = 1
+
+class RenderedSignatureCache(object):
+    """
+        Least recently used cache of rendered signatures: ``(fullname,
+        classname, nodes)`` by ``(signature, objtype, module, class)``.
+    """
+
+    def __init__(self, maxsize=20000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.changed = False
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        try:
+            value = self.entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self.entries[key] = value
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        entries = self.entries
+        while entries and len(entries) >= self.maxsize:
+            entries.popitem(last=False)
+        if self.maxsize > 0:
+            entries[key] = value
+            self.changed = True
+
+    def clear(self):
+        self.entries = OrderedDict()
+        self.changed = False
+        self.hits = self.misses = 0
+
+    def load(self, filename):
+        try:
+            f = open(filename, 'rb')
+            try:
+                version, entries = pickle.load(f)
+            finally:
+                f.close()
+        except Exception:
+            # missing, unreadable or from another version: start empty
+            return
+        if version == (CACHE_VERSION, __version__, sphinx.__version__):
+            self.entries = entries
+
+    def save(self, filename):
+        if not self.changed:
+            return
+        tmpname = filename + '.tmp'
+        f = open(tmpname, 'wb')
+        try:
+            pickle.dump(((CACHE_VERSION, __version__, sphinx.__version__),
+                         self.entries), f, pickle.HIGHEST_PROTOCOL)
+        finally:
+            f.close()
+        os.rename(tmpname, filename)
+        self.changed = False
+
+rendered_signatures = RenderedSignatureCache()
+
+def load_signature_cache(app):
+    """
+        Load the cache, or start with an empty one if the configuration
+        changed; connected to ``builder-inited``.
+    """
+    cache = rendered_signatures
+    cache.clear()
+    cache.maxsize = app.config.ooc_signature_cache_size
+    if getattr(app.env, 'config_status', None) != CONFIG_OK:
+        # replace the signatures rendered with the old configuration
+        cache.changed = True
+        return
+    cache.load(os.path.join(app.doctreedir, CACHE_NAME))
+    while len(cache.entries) > cache.maxsize:
+        cache.entries.popitem(last=False)
+        cache.changed = True
+
+def save_signature_cache(app, exception):
+    if exception is None:
+        rendered_signatures.save(os.path.join(app.doctreedir, CACHE_NAME))
+
+def setup_signature_cache(app):
+    app.add_config_value('ooc_signature_cache_size', 20000, '')
+    app.connect('builder-inited', load_signature_cache)
+    app.connect('build-finished', save_signature_cache)
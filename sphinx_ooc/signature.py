@@ -0,0 +1,231 @@
+"""
+    Pure parsing of ooc signatures.
+
+    The directives in :mod:`sphinx_ooc.desc` parse the same few signatures
+    (``init``, ``new``, ``toString -> String``) over and over again, so the
+    parse step lives here, away from any docutils node construction, and
+    its results are kept in a bounded LRU cache keyed on the raw signature.
+"""
+import re
+from collections import OrderedDict
+
+# the name cannot fail once it has its first character, so the head is
+# matched in linear time: the class name part backtracks over each
+# character at most once (see bench/signature_fuzz.py)
+ooc_sighead_re = re.compile(
+    r'''^ (\w[\w<>/,]*[ /])?          # class name(s)
+          (\w[\w<>~,]*)  \s*           # thing name
+          ''', re.VERBOSE)
+ooc_retann_re = re.compile(r'\s* -> \s* (\S.*) $', re.VERBOSE)
+ooc_generic_re = re.compile(r'[<>]')
+# everything the parameter tokenizer has to look at; inside brackets
+# commas do not matter
+ooc_paramtoken_re = re.compile(r'[`<>()\[\],]')
+ooc_bracket_re = re.compile(r'[`<>()\[\]]')
+
+_openers = {'<': '>', '(': ')', '[': ']'}
+_closers = {'>': '<', ')': '(', ']': '['}
+
+class SignatureError(ValueError):
+    """
+        Raised for signatures that cannot be parsed. *pos* is the offset
+        of the offending character in *text* (or None).
+    """
+
+    def __init__(self, message, text, pos=None):
+        ValueError.__init__(self, message, text, pos)
+        self.message = message
+        self.text = text
+        self.pos = pos
+
+    def __str__(self):
+        if self.pos is None:
+            return '%s in %r' % (self.message, self.text)
+        return '%s at column %d in %r' % (self.message, self.pos + 1,
+                                          self.text)
+
+class Signature(tuple):
+    """
+        An immutable, parsed ooc signature.
+
+        ``params`` is a tuple of parameter strings (possibly containing
+        inline markup), ``arglist`` tells whether the signature had an
+        argument list at all, ``retann`` is the raw return annotation or
+        None.
+    """
+    __slots__ = ()
+
+    def __new__(cls, classname, name, arglist, params, retann):
+        return tuple.__new__(cls, (classname, name, arglist, params, retann))
+
+    classname = property(lambda self: self[0])
+    name = property(lambda self: self[1])
+    arglist = property(lambda self: self[2])
+    params = property(lambda self: self[3])
+    retann = property(lambda self: self[4])
+
+    def __repr__(self):
+        return 'Signature(%r, %r, %r, %r, %r)' % tuple(self)
+
+def _scan_params(text, pos, terminated):
+    """
+        Split *text* into parameters, starting at *pos*, in a single pass.
+        Commas only separate parameters outside of ``<>``, ``()`` and ``[]``
+        and outside of backquoted inline markup, so ``HashMap<K, List<V>>``,
+        ``Func (A, B) -> C`` and ``:class:`~structs/HashMap HashMap<K,V>` *``
+        stay single parameters. The ``>`` of a ``->`` arrow never closes
+        anything.
+
+        If *terminated* is true, the scan stops at the first unmatched ``)``
+        and returns ``(params, position after it)``; otherwise the whole
+        text is consumed.
+    """
+    params = []
+    stack = []
+    start = pos
+    m = ooc_paramtoken_re.search(text, pos)
+    while m is not None:
+        i = m.start()
+        char = text[i]
+        if char == ',':
+            # only looked for outside of brackets
+            params.append(text[start:i])
+            start = i + 1
+        elif char in _openers:
+            stack.append(i)
+        elif char == '`':
+            # jump over the inline markup
+            end = text.find('`', i + 1)
+            if end < 0:
+                raise SignatureError('unterminated inline markup', text, i)
+            i = end
+        elif char == '>' and i > 0 and text[i - 1] == '-':
+            # return type arrow of a Func type
+            pass
+        elif stack:
+            opened_at = stack.pop()
+            opener = text[opened_at]
+            if opener != _closers[char]:
+                raise SignatureError("'%s' at column %d closed by '%s'"
+                                     % (opener, opened_at + 1, char),
+                                     text, i)
+        elif terminated and char == ')':
+            params.append(text[start:i])
+            return _clean_params(params), i + 1
+        else:
+            raise SignatureError("unbalanced '%s'" % char, text, i)
+        m = (stack and ooc_bracket_re or ooc_paramtoken_re).search(text,
+                                                                   i + 1)
+    if stack:
+        opened_at = stack[-1]
+        raise SignatureError("unclosed '%s'" % text[opened_at], text,
+                             opened_at)
+    if terminated:
+        raise SignatureError("missing ')'", text, pos - 1)
+    params.append(text[start:])
+    return _clean_params(params), len(text)
+
+def _clean_params(params):
+    return tuple([param.strip() for param in params
+                  if param and not param.isspace()])
+
+def split_arglist(arglist):
+    """
+        Split a bare argument list (the text between the parentheses of a
+        signature) into a tuple of stripped parameter strings.
+    """
+    return _scan_params(arglist, 0, False)[0]
+
+def _check_generics(sig, start, end):
+    # the generic arguments of a (class) name have to be balanced
+    depth = 0
+    opened_at = None
+    for m in ooc_generic_re.finditer(sig, start, end):
+        if m.group() == '<':
+            if not depth:
+                opened_at = m.start()
+            depth += 1
+        elif depth:
+            depth -= 1
+        else:
+            raise SignatureError("unbalanced '>'", sig, m.start())
+    if depth:
+        raise SignatureError("unclosed '<'", sig, opened_at)
+
+def _parse(sig):
+    m = ooc_sighead_re.match(sig)
+    if m is None:
+        raise SignatureError('invalid name', sig, 0)
+    classname, name = m.groups()
+    if classname:
+        _check_generics(sig, m.start(1), m.end(1))
+    _check_generics(sig, m.start(2), m.end(2))
+    pos = m.end()
+    arglist = False
+    params = ()
+    if sig[pos:pos + 1] == '(':
+        params, end = _scan_params(sig, pos + 1, True)
+        arglist = bool(sig[pos + 1:end - 1])
+        pos = end
+    retann = None
+    rest = sig[pos:]
+    if rest and not rest.isspace():
+        m = ooc_retann_re.match(rest)
+        if m is None:
+            if rest.strip() == '->':
+                raise SignatureError('missing return type', sig, pos)
+            raise SignatureError('unexpected text', sig, pos)
+        retann = m.group(1)
+    return Signature(classname, name, arglist, params, retann)
+
+class SignatureCache(object):
+    """
+        A bounded LRU cache of parsed signatures with hit/miss counters.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def parse(self, sig):
+        """
+            Return the :class:`Signature` for *sig*, parsing it on a miss.
+            Raises :exc:`SignatureError` if *sig* is not a valid ooc
+            signature; failures are not cached.
+        """
+        entries = self._entries
+        try:
+            result = entries.pop(sig)
+        except KeyError:
+            self.misses += 1
+            result = _parse(sig)
+            if entries and len(entries) >= self.maxsize:
+                entries.popitem(last=False)
+        else:
+            self.hits += 1
+        entries[sig] = result
+        return result
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        """
+            Return a dict with the cache counters.
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._entries), 'maxsize': self.maxsize}
+
+signature_cache = SignatureCache()
+
+def parse_signature(sig):
+    """
+        Parse *sig* into a :class:`Signature`, using the global cache.
+    """
+    return signature_cache.parse(sig)
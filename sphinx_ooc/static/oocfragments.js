@@ -0,0 +1,101 @@
+/*
+ * oocfragments.js
+ * ~~~~~~~~~~~~~~~
+ *
+ * Loads the member descriptions that sphinx_ooc.fragments moved out of
+ * big API pages: a description is loaded when its placeholder comes near
+ * the viewport, or right away when the page is opened at (or navigates to)
+ * an anchor inside it.
+ */
+
+var OOCFragments = {
+  _anchors: {},
+  _requested: {},
+
+  root: function() {
+    var root = document.documentElement.getAttribute('data-content_root');
+    if (root === null && typeof DOCUMENTATION_OPTIONS !== 'undefined')
+      root = DOCUMENTATION_OPTIONS.URL_ROOT || '';
+    return root || '';
+  },
+
+  // called by the page
+  addAnchors: function(anchors) {
+    for (var anchor in anchors)
+      this._anchors[anchor] = anchors[anchor];
+  },
+
+  _placeholder: function(fragment) {
+    var placeholders = document.querySelectorAll('div.ooc-fragment');
+    for (var i = 0; i < placeholders.length; i++)
+      if (placeholders[i].getAttribute('data-fragment') === fragment)
+        return placeholders[i];
+    return null;
+  },
+
+  load: function(fragment) {
+    if (this._requested[fragment])
+      return;
+    this._requested[fragment] = true;
+    var script = document.createElement('script');
+    script.src = this.root() + '_ooc_fragments/' + fragment + '.js';
+    document.getElementsByTagName('head')[0].appendChild(script);
+  },
+
+  // called by the fragments
+  set: function(fragment, html) {
+    var placeholder = this._placeholder(fragment);
+    if (placeholder === null)
+      return;
+    placeholder.innerHTML = html;
+    placeholder.className += ' ooc-fragment-loaded';
+    var anchor = this._target();
+    if (anchor !== null && this._anchors[anchor] === fragment) {
+      var element = document.getElementById(anchor);
+      if (element)
+        element.scrollIntoView();
+    }
+  },
+
+  _target: function() {
+    if (window.location.hash.length < 2)
+      return null;
+    return decodeURIComponent(window.location.hash.substr(1));
+  },
+
+  _loadTarget: function() {
+    var anchor = OOCFragments._target();
+    if (anchor !== null && anchor in OOCFragments._anchors)
+      OOCFragments.load(OOCFragments._anchors[anchor]);
+  },
+
+  _observe: function() {
+    var placeholders = document.querySelectorAll('div.ooc-fragment');
+    if (typeof IntersectionObserver === 'undefined') {
+      for (var i = 0; i < placeholders.length; i++)
+        OOCFragments.load(placeholders[i].getAttribute('data-fragment'));
+      return;
+    }
+    var observer = new IntersectionObserver(function(entries) {
+      for (var i = 0; i < entries.length; i++) {
+        if (!entries[i].isIntersecting)
+          continue;
+        observer.unobserve(entries[i].target);
+        OOCFragments.load(entries[i].target.getAttribute('data-fragment'));
+      }
+    }, {rootMargin: '600px 0px'});
+    for (var j = 0; j < placeholders.length; j++)
+      observer.observe(placeholders[j]);
+  },
+
+  _init: function() {
+    OOCFragments._loadTarget();
+    OOCFragments._observe();
+    window.addEventListener('hashchange', OOCFragments._loadTarget);
+  }
+};
+
+if (document.readyState === 'loading')
+  document.addEventListener('DOMContentLoaded', OOCFragments._init);
+else
+  OOCFragments._init();
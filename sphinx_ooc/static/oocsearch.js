@@ -0,0 +1,180 @@
+/*
+ * oocsearch.js
+ * ~~~~~~~~~~~~
+ *
+ * Symbol search over the sharded index written by sphinx_ooc.searchindex.
+ * The shared tables and the shards are loaded when a query needs them,
+ * never on page load. On the search page, the symbols matching the query
+ * are listed above the full text results.
+ */
+
+var OOCSearch = {
+  // must match PREFIX_LENGTH in searchindex.py
+  PREFIX_LENGTH: 2,
+  MAX_RESULTS: 50,
+
+  _index: null,
+  _shards: {},
+  _pending: [],
+  _requested: {},
+
+  root: function() {
+    var root = document.documentElement.getAttribute('data-content_root');
+    if (root === null && typeof DOCUMENTATION_OPTIONS !== 'undefined')
+      root = DOCUMENTATION_OPTIONS.URL_ROOT || '';
+    return root || '';
+  },
+
+  shardKey: function(name) {
+    return name.substr(0, this.PREFIX_LENGTH).toLowerCase()
+      .replace(/[^a-z0-9]/g, '_');
+  },
+
+  _load: function(filename) {
+    var script = document.createElement('script');
+    script.src = this.root() + '_ooc_search/' + filename;
+    document.getElementsByTagName('head')[0].appendChild(script);
+  },
+
+  _ready: function() {
+    var pending = this._pending;
+    this._pending = [];
+    for (var i = 0; i < pending.length; i++)
+      this._wait(pending[i].keys, pending[i].callback);
+  },
+
+  // called by index.js and the shards
+  setIndex: function(index) {
+    this._index = index;
+    this._ready();
+  },
+
+  setShard: function(key, entries) {
+    this._shards[key] = entries;
+    this._ready();
+  },
+
+  // call callback once the index and the shards in keys are loaded
+  _wait: function(keys, callback) {
+    var missing = [];
+    if (this._index === null) {
+      missing.push('index.js');
+    } else {
+      if (keys === null)
+        keys = [];
+      for (var i = 0; i < keys.length; i++)
+        if (!(keys[i] in this._shards))
+          missing.push('shard-' + keys[i] + '.js');
+    }
+    if (!missing.length)
+      return callback();
+    this._pending.push({keys: keys, callback: callback});
+    for (var j = 0; j < missing.length; j++)
+      if (!this._requested[missing[j]]) {
+        this._requested[missing[j]] = true;
+        this._load(missing[j]);
+      }
+  },
+
+  // the shards that can hold names starting with word
+  _shardsFor: function(word) {
+    var key = this.shardKey(word);
+    var keys = [];
+    for (var shard in this._index.shards)
+      if (shard.substr(0, key.length) === key)
+        keys.push(shard);
+    return keys;
+  },
+
+  /*
+   * Find the symbols whose name starts with the last word of text and
+   * whose qualified name contains the other words, and pass them to
+   * callback as {name, module, path, objtype, url, signature} objects.
+   */
+  query: function(text, callback) {
+    var self = this;
+    var words = text.toLowerCase().split(/\s+/).filter(function(word) {
+      return word.length > 0;
+    });
+    if (!words.length)
+      return callback([]);
+    var last = words.pop();
+    this._wait(null, function() {
+      self._wait(self._shardsFor(last), function() {
+        callback(self._match(last, words));
+      });
+    });
+  },
+
+  _match: function(last, words) {
+    var index = this._index;
+    var keys = this._shardsFor(last);
+    var results = [];
+    for (var i = 0; i < keys.length; i++) {
+      var entries = this._shards[keys[i]];
+      for (var j = 0; j < entries.length; j++) {
+        var entry = entries[j];
+        if (entry[0].toLowerCase().substr(0, last.length) !== last)
+          continue;
+        var module = entry[1] === null ? '' : index.modules[entry[1]];
+        var qualified = (module + ' ' + entry[2]).toLowerCase();
+        var found = true;
+        for (var k = 0; k < words.length && found; k++)
+          found = qualified.indexOf(words[k]) !== -1;
+        if (!found)
+          continue;
+        var anchor = module ? module + ' ' + entry[2] : entry[2];
+        results.push({
+          name: entry[0],
+          module: module,
+          path: entry[2],
+          objtype: index.objtypes[entry[3]],
+          url: this.root() + index.pages[entry[4]] + '#' +
+            encodeURI(anchor),
+          signature: entry[5]
+        });
+        if (results.length >= this.MAX_RESULTS)
+          return results;
+      }
+    }
+    return results;
+  },
+
+  _showResults: function() {
+    var results = document.getElementById('search-results');
+    var match = /[?&]q=([^&]*)/.exec(window.location.search);
+    if (!results || !match)
+      return;
+    var text = decodeURIComponent(match[1].replace(/\+/g, ' '));
+    OOCSearch.query(text, function(symbols) {
+      if (!symbols.length)
+        return;
+      var section = document.createElement('div');
+      section.id = 'ooc-search-results';
+      var title = document.createElement('h2');
+      title.appendChild(document.createTextNode('API symbols'));
+      section.appendChild(title);
+      var list = document.createElement('ul');
+      list.className = 'search';
+      for (var i = 0; i < symbols.length; i++) {
+        var symbol = symbols[i];
+        var item = document.createElement('li');
+        var link = document.createElement('a');
+        link.href = symbol.url;
+        link.appendChild(document.createTextNode(
+          (symbol.module ? symbol.module + ' ' : '') + symbol.path));
+        item.appendChild(link);
+        item.appendChild(document.createTextNode(
+          ' ' + symbol.signature + ' (' + symbol.objtype + ')'));
+        list.appendChild(item);
+      }
+      section.appendChild(list);
+      results.parentNode.insertBefore(section, results);
+    });
+  }
+};
+
+if (document.readyState === 'loading')
+  document.addEventListener('DOMContentLoaded', OOCSearch._showResults);
+else
+  OOCSearch._showResults();
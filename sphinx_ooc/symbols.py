@@ -0,0 +1,234 @@
+"""
+    The ooc symbol table, without any Sphinx or docutils dependency.
+
+    Objects are identified by their symbol key, the space separated
+    ``module class member`` path with generic arguments dropped. The domain
+    and the offline reference checker share the naming of declarations, the
+    parsing of reference targets and the lookup rules defined here.
+"""
+import re
+
+# the roles referring to each object type
+OBJTYPE_ROLES = {
+    'function':     ('func',),
+    'var':          ('var',),
+    'class':        ('class', 'cover'),
+    'cover':        ('cover', 'class'),
+    'method':       ('meth',),
+    'staticmethod': ('meth',),
+    'field':        ('field',),
+    'module':       ('mod',),
+}
+
+MEMBER_OBJTYPES = ('method', 'staticmethod', 'field')
+
+# `Foo<Bar>` is a generic type, `Foo <Bar>` an explicit title
+generic_title_re = re.compile(r'\S<[^<>]*(?:<.*>)?[^<>]*>$')
+explicit_title_re = re.compile(r'^(.+?)\s*(?<!\x00)<(.*?)>$', re.DOTALL)
+role_re = re.compile(r':(?:\w+:)?\w+:`((?:[^`\\]|\\.)+)`')
+
+def symbol_key(name):
+    """
+        Normalize a symbol path like ``structs/HashMap HashMap<K,V> put``
+        for lookups: generic arguments are dropped and whitespace is
+        collapsed, so ``HashMap<K,V>`` and ``HashMap<A,B>`` are the same
+        class.
+    """
+    if '<' in name:
+        chars = []
+        depth = 0
+        for char in name:
+            if char == '<':
+                depth += 1
+            elif char == '>' and depth:
+                depth -= 1
+            elif not depth:
+                chars.append(char)
+        name = ''.join(chars)
+    return ' '.join(name.split())
+
+def short_name(key):
+    """
+        Return the last component of a symbol key (``put`` for
+        ``structs/HashMap HashMap put``).
+    """
+    return key[max(key.rfind(' '), key.rfind('/')) + 1:]
+
+def split_anchor(anchor, modnames):
+    """
+        Return ``(module, path)`` for the object *anchor* documented in a
+        page describing the modules *modnames*, most specific first;
+        *module* is None for objects outside of these modules.
+    """
+    for modname in modnames:
+        if anchor.startswith(modname + ' '):
+            return modname, anchor[len(modname) + 1:]
+    return None, anchor
+
+def page_modules(modules):
+    """
+        Map each docname to the modules it describes, most specific first,
+        for the domain's ``modules`` data.
+    """
+    docmodules = {}
+    for modname, entry in modules.items():
+        docmodules.setdefault(entry[0], []).append(modname)
+    for modnames in docmodules.values():
+        modnames.sort(key=len, reverse=True)
+    return docmodules
+
+def qualify_name(classname, name, currclass, member):
+    """
+        Return ``(fully qualified name, classname)`` for a declaration of
+        *name*, with the class part *classname* from its signature, inside
+        the class *currclass* (or None). *member* tells whether it is a
+        class member (method, field) rather than a nested declaration.
+    """
+    if currclass:
+        if classname and classname.startswith(currclass):
+            # classname is repeated in the signature
+            classname = classname[len(currclass):].strip('/ ')
+        if classname:
+            # class name given in the signature, but different,
+            # should not happen
+            return currclass + '/' + classname + name, classname
+        elif member:
+            return currclass + ' ' + name, classname
+        return currclass + '/' + name, classname
+    return classname and classname + name or name, classname
+
+def reference_target(text):
+    """
+        Return ``(target, refspecific)`` for the content of a reference role
+        like ``~lang/types Bool`` or ``.HashMap put()``.
+    """
+    if not generic_title_re.search(text):
+        m = explicit_title_re.match(text)
+        if m:
+            # only trailing parens are dropped from explicit targets
+            target = m.group(2)
+            if target.endswith('()'):
+                target = target[:-2]
+            return target, False
+    target = text.lstrip('~')
+    if target.endswith('()'):
+        target = target[:-2]
+    if target[0:1] == '.':
+        return target[1:], True
+    return target, False
+
+def reference_title(text):
+    """
+        Return the text a reference role like ``~lang/types Bool`` shows.
+    """
+    if not generic_title_re.search(text):
+        m = explicit_title_re.match(text)
+        if m:
+            return m.group(1)
+    title = text.lstrip('.')
+    if title[0:1] == '~':
+        title = title[title.rfind(' ') + 1:]
+    return title
+
+def plain_signature(sig):
+    """
+        Return the signature *sig* as displayed, with the reference roles
+        replaced by their titles and the whitespace normalized.
+    """
+    text = role_re.sub(lambda m: reference_title(m.group(1)), sig)
+    return re.sub(r'\s+([,)])', r'\1', ' '.join(text.split()))
+
+def find_symbol(objects, shortnames, modname, classname, target,
+                objtypes=None, searchmode=0, suffixes=None):
+    """
+        Find the objects *target* refers to, looked up in the context of
+        *modname* and *classname*, in the symbol table made of *objects*
+        (symbol key -> entry whose second item is the object type) and the
+        reverse index *shortnames* (short name -> symbol keys). Returns a
+        list of ``(key, entry)`` matches.
+
+        Without *searchmode*, the target as given is preferred over the
+        contextual names; with it (a leading ``.`` in the reference), the
+        most specific namespace is searched first, and failing that every
+        object whose path ends in the target, taken from the index
+        *suffixes* (see :func:`suffix_index`) if given.
+    """
+    key = symbol_key(target)
+    candidates = []
+    if classname:
+        classname = symbol_key(classname)
+        if modname:
+            candidates.append(modname + ' ' + classname + ' ' + key)
+        candidates.append(classname + ' ' + key)
+    if modname:
+        candidates.append(modname + ' ' + key)
+    if searchmode:
+        candidates.append(key)
+    else:
+        candidates.insert(0, key)
+    for candidate in candidates:
+        entry = objects.get(candidate)
+        if entry is not None and (objtypes is None or entry[1] in objtypes):
+            return [(candidate, entry)]
+    if not searchmode:
+        return []
+    if suffixes is not None:
+        candidates = suffixes.get(key, ())
+    else:
+        candidates = [candidate
+                      for candidate in shortnames.get(short_name(key), ())
+                      if candidate.endswith(' ' + key) or
+                      candidate.endswith('/' + key)]
+    matches = []
+    for candidate in candidates:
+        entry = objects[candidate]
+        if objtypes is None or entry[1] in objtypes:
+            matches.append((candidate, entry))
+    return sorted(matches)
+
+def suffix_index(keys):
+    """
+        Return the reverse suffix index of the symbol *keys*: every proper
+        suffix starting after a space or a slash (the member, then the
+        class and member, then the path without the module package, ...)
+        -> the keys ending in it.
+    """
+    suffixes = {}
+    for key in keys:
+        for i, char in enumerate(key):
+            if char == ' ' or char == '/':
+                suffixes.setdefault(key[i + 1:], []).append(key)
+    return suffixes
+
+class SymbolIndex(object):
+    """
+        Batch lookups in a symbol table that does not change any more: the
+        suffix index is built once, and the result of each distinct lookup
+        (context, target, object types, search mode) is cached.
+        *references* counts the lookups asked for, *lookups* those that
+        had to be done.
+    """
+
+    def __init__(self, objects, shortnames):
+        self.objects = objects
+        self.shortnames = shortnames
+        self.suffixes = suffix_index(objects)
+        self.cache = {}
+        self.references = 0
+
+    lookups = property(lambda self: len(self.cache))
+
+    def find(self, modname, classname, target, objtypes=None, searchmode=0):
+        """
+            Like :func:`find_symbol`; the result must not be modified.
+        """
+        self.references += 1
+        key = (modname, classname, target,
+               objtypes is not None and tuple(objtypes) or None, searchmode)
+        try:
+            return self.cache[key]
+        except KeyError:
+            matches = self.cache[key] = find_symbol(
+                self.objects, self.shortnames, modname, classname, target,
+                objtypes, searchmode, self.suffixes)
+            return matches
@@ -0,0 +1,271 @@
+"""
+    Type expressions of ooc signatures.
+
+    Parameter and return annotations like ``:class:`~structs/List List<T>` *``
+    or ``Func (K, V) -> T`` are parsed into a small tree of immutable tuples.
+    The trees are interned, so every occurrence of a type in the whole SDK
+    is the same object, and so are the strings rendered from them: the
+    nodes built for an annotation and the symbol table (which stores the
+    interned strings, not the trees; see :mod:`sphinx_ooc.domain`) share
+    one copy of each name, which keeps the environment and doctree pickles
+    (and the memory of a big build) small.
+
+    Annotations that use any other markup are not type expressions;
+    :func:`parse_type` returns None for them.
+"""
+import re
+
+# interned type expressions, by constructor arguments
+_types = {}
+# interned strings
+_strings = {}
+# parsed annotations (or None), by annotation text
+_parsed = {}
+
+TYPE_ROLES = ('class', 'cover')
+
+def intern_string(text):
+    """
+        Return the canonical copy of *text*. Unlike the builtin, this
+        works for the unicode strings docutils hands out on Python 2.
+    """
+    return _strings.setdefault(text, text)
+
+def clear_type_table(app=None):
+    """
+        Forget all interned types and strings; connected to
+        ``builder-inited`` like the other caches.
+    """
+    _types.clear()
+    _strings.clear()
+    _parsed.clear()
+
+class TypeExpr(tuple):
+    """
+        Base class of the type expression nodes. Instances are interned:
+        constructing an expression equal to an existing one returns that.
+    """
+    __slots__ = ()
+
+    def __new__(cls, *args):
+        key = (cls,) + args
+        try:
+            return _types[key]
+        except KeyError:
+            expr = _types[key] = tuple.__new__(
+                cls, args + (intern_string(cls._render(*args)),))
+            return expr
+
+    def __getnewargs__(self):
+        return tuple(self[:-1])
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.text)
+
+    @property
+    def text(self):
+        """The expression as written in a signature."""
+        return self[-1]
+
+def _generics(args):
+    if args is None:
+        return ''
+    return '<%s>' % ','.join([arg.text for arg in args])
+
+class TypeName(TypeExpr):
+    """
+        A named type with optional generic arguments, e.g. ``HashMap<K,V>``,
+        referred to by a ``:class:``/``:cover:`` role from *module* (if
+        *role* is given). *short* is true for a ``~`` reference.
+    """
+    __slots__ = ()
+
+    @staticmethod
+    def _render(role, module, name, args, short):
+        return (module and module + ' ' or '') + name + _generics(args)
+
+    role = property(lambda self: self[0])
+    module = property(lambda self: self[1])
+    name = property(lambda self: self[2])
+    args = property(lambda self: self[3])
+    short = property(lambda self: self[4])
+
+    @property
+    def target(self):
+        """The text of the role, with the ``~``."""
+        return intern_string((self.short and '~' or '') + self.text)
+
+class Modified(TypeExpr):
+    """
+        A pointer (``*``), reference (``@``) or array (``[n]``) to *base*.
+    """
+    __slots__ = ()
+
+    @staticmethod
+    def _render(base, modifier):
+        return base.text + modifier
+
+    base = property(lambda self: self[0])
+    modifier = property(lambda self: self[1])
+
+class FuncType(TypeExpr):
+    """
+        A function type, ``Func``, ``Func (A, B)`` or ``Func (A) -> B``;
+        *args* is None without an argument list.
+    """
+    __slots__ = ()
+
+    @staticmethod
+    def _render(args, retann):
+        text = 'Func'
+        if args is not None:
+            text += ' (%s)' % ', '.join([arg.text for arg in args])
+        if retann is not None:
+            text += ' -> ' + retann.text
+        return text
+
+    args = property(lambda self: self[0])
+    retann = property(lambda self: self[1])
+
+type_token_re = re.compile(r'''
+    \s* (?:
+        :(?P<role>\w+):`(?P<short>~?)(?P<module>[\w/]+\ +)?
+            (?P<target>\w+)(?P<generic><)?
+      | (?P<name>\w+)
+      | (?P<punct>->|[*@<>(),`]|\[[^\]\[`]*\])
+    )''', re.VERBOSE)
+
+class _TypeParser(object):
+    """
+        Recursive descent parser for one annotation. Raises ValueError for
+        anything that is not a type expression.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+        self.token = None
+        self.advance()
+
+    def advance(self):
+        token = self.token
+        if self.pos == len(self.text.rstrip()):
+            self.token = None
+        else:
+            match = type_token_re.match(self.text, self.pos)
+            if match is None:
+                raise ValueError(self.pos)
+            self.pos = match.end()
+            self.token = match
+        return token
+
+    def punct(self, char):
+        if self.token is not None and self.token.group('punct') == char:
+            return self.advance()
+        return None
+
+    def expect(self, char):
+        if self.punct(char) is None:
+            raise ValueError(self.pos)
+
+    def type_list(self, closing, roles):
+        args = [self.parse(roles)]
+        while self.punct(','):
+            args.append(self.parse(roles))
+        self.expect(closing)
+        return tuple(args)
+
+    def parse(self, roles=True):
+        token = self.advance()
+        if token is None:
+            raise ValueError(self.pos)
+        if token.group('role'):
+            role = token.group('role')
+            if not roles or role not in TYPE_ROLES:
+                raise ValueError(self.pos)
+            args = None
+            if token.group('generic'):
+                args = self.type_list('>', False)
+            self.expect('`')
+            module = token.group('module')
+            expr = TypeName(intern_string(role),
+                            module and intern_string(module.strip()),
+                            intern_string(token.group('target')), args,
+                            bool(token.group('short')))
+        elif token.group('name') == 'Func':
+            args = retann = None
+            if self.punct('('):
+                args = ()
+                if not self.punct(')'):
+                    args = self.type_list(')', roles)
+            if self.punct('->'):
+                retann = self.parse(roles)
+            expr = FuncType(args, retann)
+        elif token.group('name'):
+            args = None
+            if self.punct('<'):
+                args = self.type_list('>', roles)
+            expr = TypeName(None, None, intern_string(token.group('name')),
+                            args, False)
+        else:
+            raise ValueError(self.pos)
+        while self.token is not None:
+            punct = self.token.group('punct') or ''
+            if punct not in ('*', '@') and not punct.startswith('['):
+                break
+            self.advance()
+            expr = Modified(expr, intern_string(punct))
+        return expr
+
+def parse_type(text):
+    """
+        Parse the annotation *text* into a :class:`TypeExpr`, or return
+        None if it is not a plain type expression.
+    """
+    try:
+        return _parsed[text]
+    except KeyError:
+        pass
+    try:
+        parser = _TypeParser(text)
+        expr = parser.parse()
+        if parser.token is not None:
+            raise ValueError(parser.pos)
+    except ValueError:
+        expr = None
+    _parsed[text] = expr
+    return expr
+
+param_re = re.compile(r'^(\s*[\w.]+(?:\s*,\s*[\w.]+)*\s*:\s+)(.*)$')
+
+def split_param(token):
+    """
+        Split a parameter of a signature like ``k1, k2: K`` into the names
+        part, ``k1, k2: ``, and the annotation. Returns None if the
+        parameter has no annotation.
+    """
+    match = param_re.match(token)
+    if match is None:
+        return None
+    return match.group(1), match.group(2)
+
+def typed_params(tokens):
+    """
+        Return the ``(name, annotation)`` pairs of the parameter *tokens* of
+        a signature. Parameters without an annotation have the one of the
+        next parameter that has (``k1, k2: K``), or None.
+    """
+    params = []
+    untyped = 0
+    for token in tokens:
+        split = split_param(token)
+        if split is None:
+            params.append([token, None])
+            untyped += 1
+            continue
+        names, annotation = split
+        for param in params[len(params) - untyped:]:
+            param[1] = annotation
+        untyped = 0
+        params.append([names.rstrip().rstrip(':').strip(), annotation])
+    return [tuple(param) for param in params]
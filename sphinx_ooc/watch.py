@@ -0,0 +1,152 @@
+"""
+    Watch mode: rebuild the docs whenever a source file changes.
+
+    The source directory is polled for changed, added and removed files; a
+    burst of changes (an editor saving several files, a ``git checkout``)
+    is collected until no file has changed for ``--delay`` seconds, then
+    ``sphinx-build`` runs once. The builds are incremental: Sphinx reads
+    the changed pages only, and :mod:`sphinx_ooc.depgraph` has the pages
+    whose ooc references now resolve differently written again. With
+    ``--port``, the output directory is also served over HTTP.
+
+    Usage: python -m sphinx_ooc.watch [options] SOURCEDIR OUTDIR
+    [-- SPHINXOPTS]
+"""
+import optparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    from http.server import HTTPServer, SimpleHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import HTTPServer
+    from SimpleHTTPServer import SimpleHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+
+def scan(srcdir, ignore=()):
+    """
+        Return ``{path: (mtime, size)}`` for the files in *srcdir*, without
+        hidden directories and the directories in *ignore* (absolute
+        paths, like the output directory).
+    """
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(srcdir):
+        dirnames[:] = [dirname for dirname in dirnames
+                       if not dirname.startswith('.') and
+                       os.path.join(dirpath, dirname) not in ignore]
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # removed while scanning
+                continue
+            files[path] = (stat.st_mtime, stat.st_size)
+    return files
+
+def changed_files(old, new):
+    """
+        Return the paths that differ between the scans *old* and *new*.
+    """
+    changed = set(path for path in new if old.get(path) != new[path])
+    changed.update(path for path in old if path not in new)
+    return changed
+
+def watch(srcdir, build, ignore=(), interval=0.25, delay=0.5):
+    """
+        Call *build* once, then with the set of changed paths whenever the
+        files in *srcdir* change and then stay unchanged for *delay*
+        seconds. Runs until interrupted.
+    """
+    files = scan(srcdir, ignore)
+    build(set())
+    pending = set()
+    last_change = 0
+    while True:
+        time.sleep(interval)
+        current = scan(srcdir, ignore)
+        changed = changed_files(files, current)
+        files = current
+        if changed:
+            pending |= changed
+            last_change = time.time()
+        elif pending and time.time() - last_change >= delay:
+            # files changed while building are picked up by the next scan
+            build(pending)
+            pending = set()
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+class _Handler(SimpleHTTPRequestHandler):
+    root = None
+
+    def translate_path(self, path):
+        path = SimpleHTTPRequestHandler.translate_path(self, path)
+        return os.path.join(self.root, os.path.relpath(path, os.getcwd()))
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(outdir, port):
+    """
+        Serve *outdir* on *port* of localhost from a background thread.
+    """
+    handler = type('Handler', (_Handler,), {'root': outdir})
+    server = _Server(('localhost', port), handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+def main(argv):
+    parser = optparse.OptionParser(
+        usage='%prog [options] SOURCEDIR OUTDIR [-- SPHINXOPTS]')
+    parser.add_option('-b', '--builder', default='html',
+                      help='builder to use (default: html)')
+    parser.add_option('-d', '--doctrees', default=None,
+                      help='doctree directory (default: OUTDIR/.doctrees)')
+    parser.add_option('-s', '--sphinx-build', default='sphinx-build',
+                      help='sphinx-build command')
+    parser.add_option('-p', '--port', type='int', default=None,
+                      help='also serve OUTDIR on this port')
+    parser.add_option('--delay', type='float', default=0.5,
+                      help='seconds without changes before building '
+                           '(default: 0.5)')
+    options, args = parser.parse_args(argv[1:])
+    if len(args) < 2:
+        parser.error('expected a source and an output directory')
+    srcdir, outdir = [os.path.abspath(arg) for arg in args[:2]]
+    doctreedir = os.path.abspath(options.doctrees or
+                                 os.path.join(outdir, '.doctrees'))
+    command = [options.sphinx_build, '-b', options.builder, '-d',
+               doctreedir] + args[2:] + [srcdir, outdir]
+
+    def build(changed):
+        if changed:
+            names = sorted(os.path.relpath(path, srcdir) for path in changed)
+            sys.stdout.write('%d files changed: %s\n' % (len(names),
+                                                          ', '.join(names)))
+        start = time.time()
+        status = subprocess.call(command)
+        sys.stdout.write('build %s in %.1fs, watching %s\n' % (
+            status and 'failed' or 'finished', time.time() - start, srcdir))
+        sys.stdout.flush()
+
+    if options.port is not None:
+        serve(outdir, options.port)
+        sys.stdout.write('serving %s on http://localhost:%d/\n' % (
+            outdir, options.port))
+    try:
+        watch(srcdir, build, ignore=(outdir, doctreedir),
+              delay=options.delay)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
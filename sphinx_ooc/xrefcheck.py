@@ -0,0 +1,210 @@
+"""
+    Offline cross-reference checker for ooc documentation.
+
+    Scans the reST sources for ooc object descriptions and references,
+    without building the docs: the declarations are named and the
+    references looked up with the same rules as the domain (see
+    :mod:`sphinx_ooc.symbols`), so a dangling or ambiguous reference is
+    reported here exactly when the build would warn about it. Files are
+    scanned in parallel, a line at a time.
+
+    Roles are only recognized within one line, and the ooc domain is taken
+    to be the primary domain (the ``ooc:`` prefix is optional).
+
+    Usage: python -m sphinx_ooc.xrefcheck [-j N] [-q] SOURCEDIR
+"""
+import optparse
+import os
+import re
+import sys
+from multiprocessing import Pool
+
+from sphinx_ooc.signature import parse_signature, SignatureError
+from sphinx_ooc.symbols import OBJTYPE_ROLES, MEMBER_OBJTYPES, symbol_key, \
+    short_name, qualify_name, reference_target, find_symbol
+
+CLASSLIKE_OBJTYPES = ('class', 'cover')
+# directives whose content is not reST
+LITERAL_DIRECTIVES = ('code-block', 'sourcecode', 'code', 'productionlist',
+                      'literalinclude', 'highlight')
+
+directive_re = re.compile(r'^(\s*)\.\. (?:ooc:)?([\w-]+)::\s*(.*?)\s*$')
+option_re = re.compile(r'^\s+:([\w-]+):\s*(.*?)\s*$')
+role_re = re.compile(r'(?<![\w`]):(?:ooc:)?(class|cover|func|meth|field|var|'
+                     r'mod):`((?:[^`\\]|\\.)+)`')
+literal_re = re.compile(r'``.+?``')
+
+ROLE_OBJTYPES = {}
+for _objtype, _roles in OBJTYPE_ROLES.items():
+    for _role in _roles:
+        ROLE_OBJTYPES.setdefault(_role, []).append(_objtype)
+
+def iter_rst_files(srcdir):
+    for dirpath, dirnames, filenames in os.walk(srcdir):
+        dirnames[:] = sorted(d for d in dirnames
+                             if not d.startswith(('.', '_')))
+        for filename in sorted(filenames):
+            if filename.endswith('.rst'):
+                yield os.path.join(dirpath, filename)
+
+def _indent(line):
+    return len(line) - len(line.lstrip())
+
+def scan_file(path):
+    """
+        Scan the reST file *path*. Returns ``(path, objects, modules, refs)``
+        with the ``(key, objtype, lineno)`` of the described objects, the
+        ``(modname, lineno)`` of the described modules and the ``(lineno,
+        role, target, modname, classname, refspecific)`` of the references.
+    """
+    f = open(path)
+    try:
+        lines = f.read().splitlines()
+    finally:
+        f.close()
+    objects = []
+    modules = []
+    refs = []
+    modname = None
+    classname = None
+    # (indent, sets class) of the directives whose content we are in
+    blocks = []
+    literal = None   # indent of the literal block we are in
+    for index, line in enumerate(lines):
+        lineno = index + 1
+        if not line.strip():
+            continue
+        indent = _indent(line)
+        if literal is not None:
+            if indent > literal:
+                continue
+            literal = None
+        while blocks and indent <= blocks[-1][0]:
+            if blocks.pop()[1]:
+                classname = None
+        match = directive_re.match(line)
+        if match is None:
+            for role, text in role_re.findall(literal_re.sub('', line)):
+                target, refspecific = reference_target(text)
+                refs.append((lineno, role, target, modname, classname,
+                             refspecific))
+            if line.rstrip().endswith('::'):
+                literal = indent
+            continue
+        directive, argument = match.group(2), match.group(3)
+        if directive in LITERAL_DIRECTIVES:
+            literal = indent
+            continue
+        options = {}
+        for option in lines[index + 1:]:
+            m = option_re.match(option)
+            if m is None:
+                break
+            options[m.group(1)] = m.group(2)
+        if directive in ('module', 'currentmodule'):
+            modname = argument
+            classname = None
+            if directive == 'currentmodule' and modname == 'None':
+                modname = None
+            elif directive == 'module' and 'noindex' not in options:
+                modules.append((modname, lineno))
+            continue
+        if directive not in OBJTYPE_ROLES:
+            blocks.append((len(match.group(1)), False))
+            continue
+        for role, text in role_re.findall(literal_re.sub('', argument)):
+            target, refspecific = reference_target(text)
+            refs.append((lineno, role, target, modname, classname,
+                         refspecific))
+        sets_class = False
+        try:
+            parsed = parse_signature(argument)
+        except SignatureError:
+            parsed = None
+        if parsed is not None:
+            fullname, sigclass = qualify_name(
+                parsed.classname, parsed.name, classname,
+                directive in MEMBER_OBJTYPES)
+            objmod = options.get('module', modname)
+            if 'noindex' not in options:
+                objects.append((symbol_key((objmod and objmod + ' ' or '') +
+                                           fullname), directive, lineno))
+            if directive in CLASSLIKE_OBJTYPES:
+                classname = fullname
+                sets_class = True
+            elif directive in MEMBER_OBJTYPES and sigclass and \
+                    not classname:
+                classname = sigclass.strip('/ ')
+                sets_class = True
+        blocks.append((len(match.group(1)), sets_class))
+    return path, objects, modules, refs
+
+def check(srcdir, jobs=None):
+    """
+        Check the references of all reST files in *srcdir*. Returns a list
+        of ``(path, lineno, message)`` problems, sorted by location.
+    """
+    paths = list(iter_rst_files(srcdir))
+    if jobs == 1:
+        results = [scan_file(path) for path in paths]
+    else:
+        pool = Pool(jobs)
+        try:
+            results = pool.map(scan_file, paths, chunksize=8)
+        finally:
+            pool.close()
+            pool.join()
+    problems = []
+    objects = {}
+    shortnames = {}
+    modules = set()
+    for path, fileobjects, filemodules, refs in results:
+        for key, objtype, lineno in fileobjects:
+            if key in objects:
+                other = objects[key][0]
+                if other[0] != path:
+                    problems.append((path, lineno, 'duplicate object '
+                                     'description of %s, other instance in '
+                                     '%s' % (key, other[0])))
+            else:
+                shortnames.setdefault(short_name(key), []).append(key)
+            objects[key] = ((path, lineno), objtype)
+        modules.update(modname for modname, lineno in filemodules)
+    for path, fileobjects, filemodules, refs in results:
+        for lineno, role, target, modname, classname, refspecific in refs:
+            if role == 'mod':
+                if target not in modules:
+                    problems.append((path, lineno, 'ooc:mod reference target '
+                                     'not found: %s' % target))
+                continue
+            matches = find_symbol(objects, shortnames, modname, classname,
+                                  target, ROLE_OBJTYPES[role],
+                                  refspecific and 1 or 0)
+            if not matches:
+                problems.append((path, lineno, 'ooc:%s reference target not '
+                                 'found: %s' % (role, target)))
+            elif len(matches) > 1:
+                problems.append((path, lineno, 'more than one target found '
+                                 'for cross-reference %r: %s' % (
+                                     target, ', '.join(key for key, entry
+                                                       in matches))))
+    problems.sort()
+    return problems
+
+def main(argv):
+    parser = optparse.OptionParser(usage='%prog [options] SOURCEDIR')
+    parser.add_option('-j', '--jobs', type='int', default=None,
+                      help='number of worker processes (default: all CPUs)')
+    parser.add_option('-q', '--quiet', action='store_true', default=False,
+                      help='only set the exit status')
+    options, args = parser.parse_args(argv[1:])
+    if len(args) != 1:
+        parser.error('expected a source directory')
+    problems = check(args[0], options.jobs)
+    if not options.quiet:
+        for path, lineno, message in problems:
+            sys.stdout.write('%s:%d: %s\n' % (path, lineno, message))
+    return problems and 1 or 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))